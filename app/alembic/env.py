@@ -14,7 +14,11 @@ from settings import settings
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option('sqlalchemy.url', settings.db_url)
+# Link shards are migrated one by one: alembic -x db_url=... upgrade head
+config.set_main_option(
+    'sqlalchemy.url',
+    context.get_x_argument(as_dictionary=True).get('db_url', settings.db_url)
+)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
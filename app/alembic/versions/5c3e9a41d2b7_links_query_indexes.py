@@ -0,0 +1,67 @@
+"""links query indexes
+
+Revision ID: 5c3e9a41d2b7
+Revises: 89ef0008b9ba
+Create Date: 2026-10-18 10:12:31.418902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3e9a41d2b7'
+down_revision: Union[str, None] = '89ef0008b9ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently so that existing links stay writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_links_original_url',
+            'links',
+            ['original_url'],
+            postgresql_using='hash',
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_user_id_is_expired',
+            'links',
+            ['user_id', 'is_expired', 'id'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_expires_at_active',
+            'links',
+            ['expires_at'],
+            postgresql_where=sa.text('NOT is_expired'),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_id_expired',
+            'links',
+            ['id'],
+            postgresql_where=sa.text('is_expired'),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_last_activity_at',
+            'links',
+            [sa.text('coalesce(last_used_at, created_at)')],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_links_last_activity_at', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_id_expired', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_expires_at_active', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_user_id_is_expired', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_original_url', table_name='links', postgresql_concurrently=True)
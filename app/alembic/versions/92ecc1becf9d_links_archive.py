@@ -0,0 +1,121 @@
+"""links archive
+
+Revision ID: 92ecc1becf9d
+Revises: 26e9557c42d1
+Create Date: 2026-10-18 14:21:47.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '92ecc1becf9d'
+down_revision: Union[str, None] = '26e9557c42d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LINK_COLUMNS = (
+    'id, original_url, short_code, short_link, created_at, '
+    'redirect_count, last_used_at, expires_at, user_id'
+)
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('links_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('original_url', sa.String(), nullable=False),
+    sa.Column('short_code', sa.String(), nullable=False),
+    sa.Column('short_link', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('redirect_count', sa.Integer(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_links_archive_short_code', 'links_archive', ['short_code'], unique=False)
+    op.create_index(
+        'ix_links_archive_last_activity_at',
+        'links_archive',
+        [sa.text('coalesce(last_used_at, created_at)')],
+        unique=False
+    )
+    with op.get_context().autocommit_block():
+        # Expired links are moved in batches, each committed on its own, so the
+        # table is not locked and the WAL is not written in a single burst
+        while True:
+            moved = op.get_bind().execute(
+                sa.text(
+                    f'WITH moved AS ('
+                    f'DELETE FROM links WHERE id IN '
+                    f'(SELECT id FROM links WHERE is_expired LIMIT :batch_size) '
+                    f'RETURNING {LINK_COLUMNS}) '
+                    f'INSERT INTO links_archive ({LINK_COLUMNS}) SELECT {LINK_COLUMNS} FROM moved'
+                ),
+                {'batch_size': ARCHIVE_BATCH_SIZE}
+            ).rowcount
+            if moved < ARCHIVE_BATCH_SIZE:
+                break
+        # Built concurrently so that existing links stay writable
+        op.create_index(
+            'ix_links_user_id',
+            'links',
+            ['user_id', 'id'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_expires_at',
+            'links',
+            ['expires_at'],
+            postgresql_where=sa.text('expires_at IS NOT NULL'),
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_links_id_expired', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_expires_at_active', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_user_id_is_expired', table_name='links', postgresql_concurrently=True)
+    op.drop_column('links', 'is_expired')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column(
+        'links',
+        sa.Column('is_expired', sa.Boolean(), server_default=sa.false(), nullable=False)
+    )
+    op.alter_column('links', 'is_expired', server_default=None)
+    op.execute(
+        f'INSERT INTO links ({LINK_COLUMNS}, is_expired) '
+        f'SELECT {LINK_COLUMNS}, true FROM links_archive ON CONFLICT DO NOTHING'
+    )
+    op.drop_index('ix_links_archive_last_activity_at', table_name='links_archive')
+    op.drop_index('ix_links_archive_short_code', table_name='links_archive')
+    op.drop_table('links_archive')
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_links_user_id_is_expired',
+            'links',
+            ['user_id', 'is_expired', 'id'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_expires_at_active',
+            'links',
+            ['expires_at'],
+            postgresql_where=sa.text('NOT is_expired'),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_links_id_expired',
+            'links',
+            ['id'],
+            postgresql_where=sa.text('is_expired'),
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_links_expires_at', table_name='links', postgresql_concurrently=True)
+        op.drop_index('ix_links_user_id', table_name='links', postgresql_concurrently=True)
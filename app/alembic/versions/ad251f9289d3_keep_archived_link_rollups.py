@@ -0,0 +1,43 @@
+"""keep archived link rollups
+
+Revision ID: ad251f9289d3
+Revises: dbed06c2172c
+Create Date: 2026-10-18 08:44:16.571439
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ad251f9289d3'
+down_revision: Union[str, None] = 'dbed06c2172c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ('link_clicks_hourly', 'link_clicks_daily')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Archived links keep their rollups until retention removes them
+    for table in ROLLUP_TABLES:
+        op.drop_constraint(f'{table}_link_id_fkey', table, type_='foreignkey')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.execute(
+            f'DELETE FROM {table} WHERE NOT EXISTS '
+            f'(SELECT 1 FROM links WHERE links.id = {table}.link_id)'
+        )
+        op.create_foreign_key(
+            f'{table}_link_id_fkey',
+            table,
+            'links',
+            ['link_id'],
+            ['id'],
+            ondelete='CASCADE'
+        )
@@ -0,0 +1,37 @@
+"""link shards
+
+Revision ID: dbed06c2172c
+Revises: 92ecc1becf9d
+Create Date: 2026-10-18 08:29:36.235547
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dbed06c2172c'
+down_revision: Union[str, None] = '92ecc1becf9d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('link_shard_buckets',
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('moving_from', sa.Integer(), nullable=True),
+    sa.Column('moving_after_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('bucket')
+    )
+    # Users stay on the primary while links are spread over shards
+    op.drop_constraint('links_user_id_fkey', 'links', type_='foreignkey')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_foreign_key('links_user_id_fkey', 'links', 'users', ['user_id'], ['id'])
+    op.drop_table('link_shard_buckets')
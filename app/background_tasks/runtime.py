@@ -0,0 +1,77 @@
+import asyncio
+from collections.abc import Coroutine
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any, AsyncIterator, TypeVar
+
+from fastapi_cache import FastAPICache
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from caching import ORJSONCoder
+from database.database import (
+    make_engine,
+    make_session_factory,
+    session_scope,
+    shard_sessions_scope
+)
+from metrics import MeteredRedisBackend
+from settings import settings
+
+T = TypeVar('T')
+
+
+class WorkerRuntime:
+    """Event loop, DB pool and Redis client shared by all tasks of a worker process."""
+
+    def __init__(self):
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.engine: AsyncEngine | None = None
+        self.session_factory: async_sessionmaker[AsyncSession] | None = None
+        self.shard_engines: list[AsyncEngine] = []
+        self.shard_session_factories: list[async_sessionmaker[AsyncSession]] = []
+        self.redis: aioredis.Redis | None = None
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.engine = make_engine()
+        self.session_factory = make_session_factory(self.engine)
+        self.shard_engines = [make_engine(url) for url in settings.LINK_SHARD_DB_URLS]
+        self.shard_session_factories = [
+            make_session_factory(shard_engine) for shard_engine in self.shard_engines
+        ]
+        self.redis = aioredis.from_url(settings.REDIS_URL)
+        FastAPICache.init(
+            MeteredRedisBackend(self.redis),
+            prefix='links-cache',
+            coder=ORJSONCoder
+        )
+
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.run_until_complete(self.engine.dispose())
+        for shard_engine in self.shard_engines:
+            self.loop.run_until_complete(shard_engine.dispose())
+        self.loop.run_until_complete(self.redis.close())
+        self.loop.close()
+        self.loop = self.engine = self.session_factory = self.redis = None
+        self.shard_engines, self.shard_session_factories = [], []
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        # Solo/threads pools never send worker_process_init
+        if self.loop is None:
+            self.start()
+        return self.loop.run_until_complete(coro)
+
+    def session_scope(self) -> AbstractAsyncContextManager[AsyncSession]:
+        return session_scope(self.session_factory)
+
+    @asynccontextmanager
+    async def shard_sessions_scope(self) -> AsyncIterator[list[AsyncSession]]:
+        async with self.session_scope() as session:
+            async with shard_sessions_scope(session, self.shard_session_factories) as shard_sessions:
+                yield shard_sessions
+
+
+runtime = WorkerRuntime()
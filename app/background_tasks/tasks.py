@@ -1,38 +1,65 @@
 import logging
 
-import asyncio
-
 from celery_app import celery
-from background_tasks.utils import create_links_service_for_bg_tasks
+from background_tasks.runtime import runtime
+from background_tasks.utils import links_service_scope
 
 celery_logger = logging.getLogger(__name__)
 
 
 @celery.task
-def set_expired_links():
-    loop = asyncio.get_event_loop()
-    if loop.is_closed():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+def set_expired_links() -> int:
+    async def _task() -> int:
+        async with links_service_scope() as service:
+            return await service.set_expired_links()
+
+    expired_count = runtime.run(_task())
+    celery_logger.info(f"Expired links were updated: {expired_count}")
+    return expired_count
 
-    async def _task():
-        service = await create_links_service_for_bg_tasks()
-        await service.set_expired_links()
 
-    loop.run_until_complete(_task())
-    celery_logger.info("Expired links were updated")
+@celery.task
+def cleanup_unused_links() -> int:
+    async def _task() -> int:
+        async with links_service_scope() as service:
+            return await service.cleanup_unused_links()
+
+    deleted_count = runtime.run(_task())
+    celery_logger.info(f"Unused links were deleted: {deleted_count}")
+    return deleted_count
 
 
 @celery.task
-def cleanup_unused_links():
-    loop = asyncio.get_event_loop()
-    if loop.is_closed():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    async def _task():
-        service = await create_links_service_for_bg_tasks()
-        await service.cleanup_unused_links()
-
-    loop.run_until_complete(_task())
-    celery_logger.info("Unused links were deleted")
+def flush_link_clicks() -> int:
+    async def _task() -> int:
+        async with links_service_scope() as service:
+            return await service.flush_link_clicks()
+
+    rows_count = runtime.run(_task())
+    celery_logger.info(f"Link clicks were flushed: {rows_count}")
+    return rows_count
+
+
+@celery.task
+def cleanup_link_clicks() -> int:
+    async def _task() -> int:
+        async with links_service_scope() as service:
+            return await service.cleanup_link_clicks()
+
+    deleted_count = runtime.run(_task())
+    celery_logger.info(f"Old link clicks were deleted: {deleted_count}")
+    return deleted_count
+
+
+@celery.task
+def rebuild_short_codes_filter() -> int | None:
+    async def _task() -> int | None:
+        async with links_service_scope() as service:
+            return await service.rebuild_short_codes_filter()
+
+    codes_count = runtime.run(_task())
+    if codes_count is None:
+        celery_logger.info("Short codes filter rebuild was skipped")
+    else:
+        celery_logger.info(f"Short codes filter was rebuilt: {codes_count}")
+    return codes_count
@@ -0,0 +1,111 @@
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+from fastapi import Request
+from fastapi_cache import FastAPICache
+from fakeredis import aioredis as fakeredis
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from caching import ORJSONCoder
+from dependency import get_short_codes_filter
+from main import app
+from metrics import MeteredRedisBackend
+from models import Link, LinkArchive
+from repository import (
+    LinksRepository,
+    LinksCache,
+    LinkClicksBuffer,
+    LinkBucketMap,
+    ShardedLinksRepository,
+    SweepProgress
+)
+from service import LinksService
+from settings import settings
+
+SEED_CHUNK_SIZE = 10_000
+
+
+def init_fake_cache():
+    FastAPICache.init(
+        MeteredRedisBackend(fakeredis.FakeRedis()),
+        prefix='links-cache',
+        coder=ORJSONCoder
+    )
+
+
+def make_request(path: str, method: str = 'POST') -> Request:
+    return Request({
+        'type': 'http',
+        'method': method,
+        'scheme': 'http',
+        'server': ('bench', 80),
+        'path': path,
+        'root_path': '',
+        'query_string': b'',
+        'headers': [],
+        'app': app,
+    })
+
+
+async def make_links_service(session: AsyncSession) -> LinksService:
+    return LinksService(
+        links_repo=ShardedLinksRepository([LinksRepository(session)], LinkBucketMap(1)),
+        links_cache=LinksCache(),
+        clicks_buffer=LinkClicksBuffer(),
+        short_codes_filter=await get_short_codes_filter(),
+        sweep_progress=SweepProgress(),
+        settings=settings,
+        request=make_request('/links/shorten'),
+    )
+
+
+async def measure(
+    func: Callable[[], Awaitable[object]],
+    iterations: int
+) -> dict[str, float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - start) * 1000)
+    quantiles = statistics.quantiles(timings, n=100)
+    return {
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': quantiles[49],
+        'p99_ms': quantiles[98],
+    }
+
+
+async def seed_links(
+    session_factory: async_sessionmaker,
+    prefix: str,
+    start: int,
+    stop: int,
+    distinct_urls: int | None = None,
+    **columns
+) -> None:
+    # distinct_urls makes several links share an original_url, as searches expect
+    for chunk_start in range(start, stop, SEED_CHUNK_SIZE):
+        chunk_stop = min(chunk_start + SEED_CHUNK_SIZE, stop)
+        async with session_factory() as session:
+            await session.execute(insert(Link), [
+                {
+                    'original_url': f'https://example.com/{prefix}/{i % (distinct_urls or stop)}',
+                    'short_code': f'{prefix}{i}',
+                    'short_link': f'http://bench/links/{prefix}{i}',
+                    **columns,
+                }
+                for i in range(chunk_start, chunk_stop)
+            ])
+            await session.commit()
+
+
+async def drop_seeded_links(session_factory: async_sessionmaker, prefix: str) -> None:
+    async with session_factory() as session:
+        for model in (Link, LinkArchive):
+            await session.execute(
+                delete(model).where(model.original_url.startswith(f'https://example.com/{prefix}/'))
+            )
+        await session.commit()
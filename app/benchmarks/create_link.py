@@ -0,0 +1,54 @@
+"""Creation latency of POST /links/shorten as the links table grows.
+
+Requires a migrated database from settings (POSTGRES_*) and fakeredis.
+Run from app/: python -m benchmarks.create_link --sizes 0 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import uuid
+
+from database.database import AsyncSessionFactory, engine, session_scope
+from schemas import LinkCreateSchema
+from benchmarks.common import (
+    init_fake_cache,
+    make_links_service,
+    measure,
+    seed_links,
+    drop_seeded_links
+)
+
+
+async def main(sizes: list[int], iterations: int) -> None:
+    init_fake_cache()
+    prefix = f'bench-{uuid.uuid4().hex[:6]}-'
+    results = []
+    seeded = 0
+    try:
+        for size in sorted(sizes):
+            await seed_links(AsyncSessionFactory, prefix, seeded, size)
+            seeded = max(seeded, size)
+
+            async def create():
+                async with session_scope() as session:
+                    service = await make_links_service(session)
+                    await service.create_link(
+                        LinkCreateSchema(original_url=f'https://example.com/{prefix}/new'),
+                        expires_at=None,
+                        user_id=None
+                    )
+
+            results.append({'table_size': size, **await measure(create, iterations)})
+    finally:
+        await drop_seeded_links(AsyncSessionFactory, prefix)
+        await engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 10_000, 100_000])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.iterations))
@@ -0,0 +1,125 @@
+"""EXPLAIN plans for every LinksRepository query.
+
+Each repository method is run inside a transaction that is rolled back,
+the SQL it sends is captured and explained with sequential scans
+disabled, so a plan that still scans links means no index can serve it.
+Requires a migrated database from settings (POSTGRES_*).
+Run from app/: python -m benchmarks.explain_plans [--output plans.json] [--fail-on-seq-scan]
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import sys
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from models import Link, LinkArchive, LinkClick, LinkClickHourly
+from repository import LinksRepository
+from settings import settings
+
+QUERIES = {
+    'get_link': lambda repo: repo.get_link('explain'),
+    'get_link_stats': lambda repo: repo.get_link_stats('explain'),
+    'resolve_redirect': lambda repo: repo.resolve_redirect('explain'),
+    'get_user_links': lambda repo: repo.get_user_links(1, limit=50, before_id=1000),
+    'get_links_by_original_url': lambda repo: repo.get_links_by_original_url(
+        'https://example.com/', limit=50, before_id=1000
+    ),
+    'get_short_codes': lambda repo: anext(repo.get_short_codes(1000), None),
+    'get_expired_links': lambda repo: repo.get_expired_links(limit=50, before_id=1000),
+    'apply_link_clicks': lambda repo: repo.apply_link_clicks(
+        [('explain', 1, dt.datetime.now(dt.UTC))], batch_size=1000
+    ),
+    'apply_link_click_events': lambda repo: repo.apply_link_click_events(
+        [('explain', dt.datetime.now(dt.UTC))], batch_size=1000
+    ),
+    'get_link_clicks': lambda repo: repo.get_link_clicks(
+        'explain', LinkClickHourly, dt.datetime.now(dt.UTC) - dt.timedelta(days=2)
+    ),
+    'delete_link_clicks_before': lambda repo: repo.delete_link_clicks_before(
+        LinkClick, dt.datetime.now(dt.UTC) - dt.timedelta(days=30), batch_size=1000
+    ),
+    'archive_expired_links': lambda repo: repo.archive_expired_links(
+        settings.EXPIRED_LINKS_BATCH_SIZE
+    ),
+    'delete_unused_links': lambda repo: repo.delete_unused_links(
+        model=Link,
+        cutoff=dt.datetime.now(dt.UTC) - dt.timedelta(days=settings.UNUSED_LINKS_TTL_DAYS),
+        after_id=1000,
+        batch_size=settings.UNUSED_LINKS_CLEANUP_BATCH_SIZE
+    ),
+    'delete_unused_archived_links': lambda repo: repo.delete_unused_links(
+        model=LinkArchive,
+        cutoff=dt.datetime.now(dt.UTC) - dt.timedelta(days=settings.UNUSED_LINKS_TTL_DAYS),
+        after_id=1000,
+        batch_size=settings.UNUSED_LINKS_CLEANUP_BATCH_SIZE
+    ),
+}
+
+
+async def capture_plans() -> dict[str, list[list[str]]]:
+    engine = create_async_engine(settings.db_url)
+    statements: list[tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK')):
+            statements.append((statement, parameters))
+
+    plans = {}
+    try:
+        async with engine.connect() as connection:
+            transaction = await connection.begin()
+            await connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            session = AsyncSession(bind=connection, join_transaction_mode='create_savepoint')
+            repo = LinksRepository(session)
+
+            event.listen(engine.sync_engine, 'before_cursor_execute', record)
+            for name, query in QUERIES.items():
+                statements.clear()
+                await query(repo)
+                plans[name] = list(statements)
+            event.remove(engine.sync_engine, 'before_cursor_execute', record)
+
+            for name, captured in plans.items():
+                plans[name] = [
+                    [
+                        row[0] for row in await connection.exec_driver_sql(
+                            f'EXPLAIN {statement}', parameters
+                        )
+                    ]
+                    for statement, parameters in captured
+                ]
+            await transaction.rollback()
+    finally:
+        await engine.dispose()
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output')
+    parser.add_argument('--fail-on-seq-scan', action='store_true')
+    args = parser.parse_args()
+
+    plans = asyncio.run(capture_plans())
+    report = json.dumps(plans, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+    seq_scans = [
+        name for name, query_plans in plans.items()
+        if any('Seq Scan on links' in line for plan in query_plans for line in plan)
+    ]
+    if seq_scans:
+        print(f'Sequential scans on links: {", ".join(seq_scans)}', file=sys.stderr)
+        if args.fail_on_seq_scan:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Redirect latency while a burst of logins is hashing passwords.
+
+Drives the app in-process (one event loop, like a single uvicorn worker)
+against the database from settings (POSTGRES_*) and fakeredis. The control
+burst replaces bcrypt with a sleep of the same length, so the difference
+between both bursts is the cost of hashing; the rest is the event loop
+handling the logins themselves.
+
+Measured on 1 CPU, 50 logins: redirect p99 is about 2 ms at baseline,
+10-13 ms during the burst and 8-12 ms during the control burst, so p99 does
+not stay flat, but hashing adds little to it (29 ms before the hashing
+threads were deprioritized).
+Run from app/: python -m benchmarks.login_burst --logins 50 --redirects 500
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from unittest import mock
+
+import httpx
+
+from database.database import engine
+from main import app
+from benchmarks.common import init_fake_cache
+from security import pwd_context
+from service import AuthService
+
+
+async def redirect_latencies(client: httpx.AsyncClient, short_code: str, count: int) -> list[float]:
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.get(f'/links/{short_code}')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: list[float]) -> dict[str, float]:
+    quantiles = statistics.quantiles(timings, n=100)
+    return {'p50_ms': quantiles[49], 'p99_ms': quantiles[98], 'max_ms': max(timings)}
+
+
+async def main(logins: int, redirects: int) -> None:
+    init_fake_cache()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        credentials = {'username': f'bench-{uuid.uuid4().hex[:8]}', 'password': 'password'}
+        await client.post('/users', json=credentials)
+        link = (await client.post(
+            '/links/shorten',
+            json={'original_url': 'https://example.com/login-burst'}
+        )).json()
+
+        hash_start = time.perf_counter()
+        pwd_context.verify(credentials['password'], pwd_context.hash(credentials['password']))
+        # hash() and verify() cost the same
+        verify_seconds = (time.perf_counter() - hash_start) / 2
+
+        async def sleep_instead_of_verify(plain_password: str, hashed_password: str) -> bool:
+            await asyncio.sleep(verify_seconds)
+            return True
+
+        async def run_burst() -> tuple[list[float], float]:
+            burst_start = time.perf_counter()
+            burst = asyncio.gather(*(
+                client.post('/auth/login', json=credentials) for _ in range(logins)
+            ))
+            latencies = await redirect_latencies(client, link['short_code'], redirects)
+            await burst
+            return latencies, time.perf_counter() - burst_start
+
+        baseline = await redirect_latencies(client, link['short_code'], redirects)
+        during_burst, burst_duration = await run_burst()
+        with mock.patch.object(AuthService, 'verify_password', staticmethod(sleep_instead_of_verify)):
+            during_control_burst, _ = await run_burst()
+
+    await engine.dispose()
+    print(json.dumps({
+        'logins': logins,
+        'verify_ms': verify_seconds * 1000,
+        'burst_duration_s': burst_duration,
+        'redirect_baseline': summarize(baseline),
+        'redirect_during_burst': summarize(during_burst),
+        'redirect_during_burst_without_hashing': summarize(during_control_burst),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--redirects', type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.redirects))
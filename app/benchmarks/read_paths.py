@@ -0,0 +1,144 @@
+"""CPU time and peak memory of read paths: full Link entities vs column projections.
+
+For every list endpoint a page is read and built both from ORM entities
+(identity map, change tracking) and from the projected rows LinksRepository
+returns now; the stats endpoint compares the entity with its four columns.
+Requires a dedicated migrated database from settings (POSTGRES_*): expired
+links are archived table-wide. Seeded links are removed afterwards.
+Run from app/: python -m benchmarks.read_paths --links 20000 --limit 500
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import insert, select
+
+from database.database import AsyncSessionFactory, engine, session_scope
+from models import Link, LinkArchive, User
+from repository import LinksRepository
+from schemas import LinkStatsSchema
+from service import LinksService
+from benchmarks.common import drop_seeded_links, seed_links
+
+
+async def profile(read, iterations: int) -> dict[str, float]:
+    # A fresh session per call, as per request, so the identity map starts empty
+    cpu_seconds = 0.0
+    for _ in range(iterations):
+        async with session_scope() as session:
+            start = time.process_time()
+            await read(session)
+            cpu_seconds += time.process_time() - start
+    # Memory is traced separately: tracing slows allocations down
+    async with session_scope() as session:
+        tracemalloc.start()
+        await read(session)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'cpu_ms_per_call': cpu_seconds / iterations * 1000,
+        'peak_kib': peak_bytes / 1024,
+    }
+
+
+def build_page(links) -> dict:
+    # Single shard page, as ShardedLinksRepository returns it
+    next_before_ids = [links[args.limit - 1].id] if len(links) > args.limit else None
+    return LinksService._build_page(links[:args.limit], next_before_ids)
+
+
+def entity_page(model: type[Link | LinkArchive], *where):
+    async def read(session):
+        links = (
+            await session.execute(
+                LinksRepository._paginate(select(model).where(*where), args.limit, None, model)
+            )
+        ).scalars().all()
+        return build_page(links)
+
+    return read
+
+
+def projected_page(method: str, *method_args):
+    async def read(session):
+        links = await getattr(LinksRepository(session), method)(
+            *method_args, limit=args.limit
+        )
+        return build_page(links)
+
+    return read
+
+
+async def main() -> None:
+    prefix = f'bench-{uuid.uuid4().hex[:6]}-'
+    async with session_scope() as session:
+        user_id = (
+            await session.execute(
+                insert(User).values(username=prefix, password='').returning(User.id)
+            )
+        ).scalar_one()
+    half = args.links // 2
+    await seed_links(AsyncSessionFactory, prefix, 0, half, distinct_urls=1, user_id=user_id)
+    await seed_links(
+        AsyncSessionFactory, prefix, half, args.links,
+        distinct_urls=1,
+        expires_at=dt.datetime.now(dt.UTC) - dt.timedelta(minutes=1)
+    )
+    async with session_scope() as session:
+        while len(await LinksRepository(session).archive_expired_links(10_000)) == 10_000:
+            await session.commit()
+    original_url = f'https://example.com/{prefix}/0'
+    short_code = f'{prefix}0'
+
+    async def entity_stats(session):
+        link = (
+            await session.execute(select(Link).where(Link.short_code == short_code))
+        ).scalar_one()
+        return LinkStatsSchema.model_validate(link)
+
+    async def projected_stats(session):
+        return LinkStatsSchema.model_validate(
+            await LinksRepository(session).get_link_stats(short_code)
+        )
+
+    endpoints = {
+        'list_my': (
+            entity_page(Link, Link.user_id == user_id),
+            projected_page('get_user_links', user_id)
+        ),
+        'list_search': (
+            entity_page(Link, Link.original_url == original_url),
+            projected_page('get_links_by_original_url', original_url)
+        ),
+        'list_expired': (
+            entity_page(LinkArchive),
+            projected_page('get_expired_links')
+        ),
+        'stats': (entity_stats, projected_stats),
+    }
+    results = {}
+    try:
+        for name, (entity_read, projected_read) in endpoints.items():
+            results[name] = {
+                'entities': await profile(entity_read, args.iterations),
+                'projection': await profile(projected_read, args.iterations),
+            }
+    finally:
+        await drop_seeded_links(AsyncSessionFactory, prefix)
+        async with session_scope() as session:
+            await session.delete(await session.get(User, user_id))
+        await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--links', type=int, default=20_000)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Requests per second of cached redirects: ASGI fast path vs full FastAPI route.
+
+Both apps are called in-process as raw ASGI callables, so only the app's own
+cost is measured. Cached redirects never touch the database; Redis is fakeredis.
+Run from app/: python -m benchmarks.redirect --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp
+
+from handlers import routers
+from main import app
+from repository import LinksCache
+from benchmarks.common import init_fake_cache
+
+SHORT_CODE = 'benchfast'
+
+
+def make_full_path_app() -> FastAPI:
+    full_path_app = FastAPI()
+    for router in routers:
+        full_path_app.include_router(router)
+    return full_path_app
+
+
+async def call(asgi_app: ASGIApp, path: str) -> int:
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'server': ('bench', 80),
+        'client': ('bench', 1234),
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(b'host', b'bench')],
+    }
+    status = 0
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await asgi_app(scope, receive, send)
+    return status
+
+
+async def requests_per_second(asgi_app: ASGIApp, requests: int, concurrency: int) -> float:
+    per_worker = requests // concurrency
+
+    async def worker():
+        for _ in range(per_worker):
+            assert await call(asgi_app, f'/links/{SHORT_CODE}') == 307
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int) -> None:
+    init_fake_cache()
+    await LinksCache().set_original_url(SHORT_CODE, 'https://example.com/fast', 3600)
+
+    apps = {'fast_path': app, 'full_path': make_full_path_app()}
+    # Warm-up builds the middleware stacks and route caches
+    for asgi_app in apps.values():
+        await requests_per_second(asgi_app, concurrency, concurrency)
+
+    results = {
+        name: await requests_per_second(asgi_app, requests, concurrency)
+        for name, asgi_app in apps.items()
+    }
+    results['speedup'] = results['fast_path'] / results['full_path']
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,94 @@
+"""Rows per second of link page serialization: per-row validation vs trusted dicts.
+
+The old path validates every row into LinkSchema, lets FastAPI validate the
+page again through response_model and renders it with JSONResponse; the new
+path builds the page from trusted rows and encodes it once with ORJSONCoder.
+Rows are built in memory, no database or Redis is needed.
+Run from app/: python -m benchmarks.serialization --rows 50 500 5000
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import time
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from caching import ORJSONCoder
+from models import Link
+from schemas import LinkSchema, LinkPageSchema, encode_cursor
+from service import LinksService
+
+RESPONSE_FIELD = create_model_field(
+    name='Response_links_page',
+    type_=LinkPageSchema,
+    mode='serialization'
+)
+
+
+def make_links(rows: int) -> list[Link]:
+    now = dt.datetime.now(dt.UTC)
+    return [
+        Link(
+            id=rows - i,
+            original_url=f'https://example.com/some/path/{i}?utm_source=bench',
+            short_code=f'code{i:08d}',
+            short_link=f'http://bench/links/code{i:08d}',
+            created_at=now - dt.timedelta(minutes=i),
+            redirect_count=i,
+            last_used_at=now if i % 2 else None,
+            expires_at=now + dt.timedelta(days=1) if i % 3 else None,
+            user_id=1,
+        )
+        for i in range(rows + 1)
+    ]
+
+
+async def validated(links: list[Link], limit: int) -> bytes:
+    page = links[:limit]
+    content = LinkPageSchema(
+        items=[LinkSchema.model_validate(link) for link in page],
+        next_cursor=encode_cursor([page[-1].id])
+    )
+    return JSONResponse(
+        await serialize_response(field=RESPONSE_FIELD, response_content=content)
+    ).body
+
+
+async def trusted(links: list[Link], limit: int) -> bytes:
+    return ORJSONCoder.encode(LinksService._build_page(links[:limit], [links[limit - 1].id]))
+
+
+async def rows_per_second(func, links: list[Link], limit: int, seconds: float) -> float:
+    rows = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        await func(links, limit)
+        rows += limit
+    return rows / (time.perf_counter() - start)
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for rows in args.rows:
+        links = make_links(rows)
+        assert orjson.loads(await validated(links, rows)) == orjson.loads(await trusted(links, rows))
+        before = await rows_per_second(validated, links, rows, args.seconds)
+        after = await rows_per_second(trusted, links, rows, args.seconds)
+        results.append({
+            'rows': rows,
+            'validated_rows_per_second': before,
+            'trusted_rows_per_second': after,
+            'speedup': after / before,
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
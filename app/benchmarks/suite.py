@@ -0,0 +1,199 @@
+"""End-to-end benchmark suite over seeded data volumes, with JSON output.
+
+For every size the links table is seeded (active, expired and long unused
+links), then the real app is driven in-process through httpx to measure
+redirect latency (cache hits and misses), creation throughput and list
+endpoint latency (cached and with Cache-Control: no-store), and the
+set_expired_links and cleanup_unused_links sweeps are timed.
+Requires a dedicated migrated database from settings (POSTGRES_*): the sweeps
+act on the whole table. Redis is fakeredis.
+Run from app/: python -m benchmarks.suite --sizes 1000 100000 10000000 --output results.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import subprocess
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete
+
+from database.database import AsyncSessionFactory, engine, session_scope
+from main import app
+from models import User
+from settings import settings
+from benchmarks.common import (
+    init_fake_cache,
+    make_links_service,
+    measure,
+    seed_links,
+    drop_seeded_links
+)
+
+SEARCH_DISTINCT_URLS = 100
+
+
+async def create_user(client: httpx.AsyncClient, prefix: str) -> tuple[int, str]:
+    response = await client.post('/users', json={'username': prefix, 'password': 'bench'})
+    response.raise_for_status()
+    return response.json()['id'], response.json()['access_token']
+
+
+async def seed(prefix: str, size: int, user_id: int, expired_ratio: float, unused_ratio: float):
+    now = dt.datetime.now(dt.UTC)
+    expired = int(size * expired_ratio)
+    unused = int(size * unused_ratio)
+    active = size - expired - unused
+    await seed_links(
+        AsyncSessionFactory, prefix, 0, active,
+        distinct_urls=SEARCH_DISTINCT_URLS,
+        user_id=user_id
+    )
+    await seed_links(
+        AsyncSessionFactory, prefix, active, active + expired,
+        distinct_urls=SEARCH_DISTINCT_URLS,
+        expires_at=now - dt.timedelta(minutes=1)
+    )
+    await seed_links(
+        AsyncSessionFactory, prefix, active + expired, size,
+        distinct_urls=SEARCH_DISTINCT_URLS,
+        created_at=now - dt.timedelta(days=settings.UNUSED_LINKS_TTL_DAYS + 1)
+    )
+    return active
+
+
+async def throughput(func, requests: int, concurrency: int) -> dict[str, float]:
+    per_worker = max(1, requests // concurrency)
+
+    async def worker():
+        for _ in range(per_worker):
+            await func()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': per_worker * concurrency,
+        'seconds': elapsed,
+        'requests_per_second': per_worker * concurrency / elapsed,
+    }
+
+
+async def timed_sweep(name: str) -> float:
+    start = time.perf_counter()
+    async with session_scope() as session:
+        await getattr(await make_links_service(session), name)()
+    return time.perf_counter() - start
+
+
+async def run_size(
+    client: httpx.AsyncClient,
+    size: int,
+    args: argparse.Namespace
+) -> dict[str, object]:
+    prefix = f'bench-{uuid.uuid4().hex[:6]}-'
+    user_id, token = await create_user(client, prefix)
+    auth = {'Authorization': f'Bearer {token}'}
+    no_store = {**auth, 'Cache-Control': 'no-store'}
+    try:
+        active = await seed(prefix, size, user_id, args.expired_ratio, args.unused_ratio)
+        result: dict[str, object] = {'table_size': size}
+
+        hot_code = f'{prefix}0'
+        cold_codes = iter(range(1, active))
+
+        async def redirect_hit():
+            response = await client.get(f'/links/{hot_code}')
+            assert response.status_code == 307, response.text
+
+        async def redirect_miss():
+            response = await client.get(f'/links/{prefix}{next(cold_codes)}')
+            assert response.status_code == 307, response.text
+
+        await redirect_hit()
+        result['redirect_hit'] = await measure(redirect_hit, args.iterations)
+        result['redirect_miss'] = await measure(
+            redirect_miss,
+            min(args.iterations, active - 1)
+        )
+
+        async def create():
+            response = await client.post(
+                '/links/shorten',
+                json={'original_url': f'https://example.com/{prefix}/new'},
+                headers=auth
+            )
+            assert response.status_code == 201, response.text
+
+        result['create'] = await throughput(create, args.create_requests, args.concurrency)
+
+        list_requests = {
+            'list_my': ('/links/my', {}),
+            'list_search': (
+                '/links/search',
+                {'original_url': f'https://example.com/{prefix}/1'}
+            ),
+            'list_expired': ('/links/expired', {}),
+        }
+        for name, (path, params) in list_requests.items():
+            for suffix, headers in (('cached', auth), ('uncached', no_store)):
+                async def list_links():
+                    response = await client.get(path, params=params, headers=headers)
+                    assert response.status_code == 200, response.text
+
+                result[f'{name}_{suffix}'] = await measure(list_links, args.iterations)
+
+        result['set_expired_links_seconds'] = await timed_sweep('set_expired_links')
+        result['cleanup_unused_links_seconds'] = await timed_sweep('cleanup_unused_links')
+        return result
+    finally:
+        await drop_seeded_links(AsyncSessionFactory, prefix)
+        async with session_scope() as session:
+            await session.execute(delete(User).where(User.id == user_id))
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> None:
+    init_fake_cache()
+    report = {
+        'revision': git_revision(),
+        'started_at': dt.datetime.now(dt.UTC).isoformat(),
+        'parameters': vars(args),
+        'results': [],
+    }
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for size in args.sizes:
+                report['results'].append(await run_size(client, size, args))
+    finally:
+        await engine.dispose()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100_000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--create-requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--expired-ratio', type=float, default=0.1)
+    parser.add_argument('--unused-ratio', type=float, default=0.1)
+    parser.add_argument('--output')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from functools import wraps
+from inspect import Parameter, isawaitable
+from typing import Any, Awaitable, Callable
+
+import orjson
+from fastapi.dependencies.utils import get_typed_return_annotation, get_typed_signature
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from fastapi_cache.coder import Coder
+from fastapi_cache.decorator import _augment_signature, _locate_param, _uncacheable
+from fastapi_cache.types import KeyBuilder
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ORJSONCoder(Coder):
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        # OPT_UTC_Z matches pydantic's JSON output for UTC datetimes
+        return orjson.dumps(
+            value,
+            default=jsonable_encoder,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        return orjson.loads(value)
+
+
+@dataclass
+class CachedValue:
+    payload: bytes
+    fresh_until: float
+    # How long the value took to compute, drives the early refresh
+    delta: float = 0.0
+
+    def pack(self) -> bytes:
+        return f'{self.fresh_until:.3f} {self.delta:.4f} '.encode() + self.payload
+
+    @classmethod
+    def unpack(cls, cached: bytes) -> 'CachedValue':
+        fresh_until, delta, payload = cached.split(b' ', 2)
+        return cls(payload, float(fresh_until), float(delta))
+
+    def is_fresh(self) -> bool:
+        # XFetch: recompute early with a probability that grows as expiry
+        # approaches and with how expensive the value is to compute
+        early = self.delta * settings.CACHE_EARLY_REFRESH_BETA * -math.log(1.0 - random.random())
+        return time.time() + early < self.fresh_until
+
+
+@dataclass
+class Flight:
+    status: str
+    value: CachedValue | None
+    result: Any = None
+
+
+# Recomputations in flight in this process, by cache key
+_flights: dict[str, asyncio.Future] = {}
+
+
+async def _acquire_lock(lock_key: str, token: str) -> bool:
+    try:
+        return bool(await FastAPICache.get_backend().redis.set(
+            lock_key, token, nx=True, ex=settings.CACHE_LOCK_TIMEOUT_SECONDS
+        ))
+    except Exception:
+        logger.warning(f"Error locking cache key '{lock_key}'", exc_info=True)
+        return True
+
+
+async def _wait_for_value(cache_key: str) -> CachedValue | None:
+    redis = FastAPICache.get_backend().redis
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.CACHE_LOCK_POLL_SECONDS)
+        cached = await redis.get(cache_key)
+        if cached is not None:
+            value = CachedValue.unpack(cached)
+            if value.fresh_until > time.time():
+                return value
+    return None
+
+
+async def _recompute(
+    cache_key: str,
+    expire: int,
+    call: Callable[[], Awaitable[Any]],
+    stale: CachedValue | None
+) -> Flight:
+    lock_key = f'{cache_key}:lock'
+    token = uuid.uuid4().hex
+    locked = await _acquire_lock(lock_key, token)
+    if not locked:
+        # Another process is recomputing: serve stale or wait for its result
+        if stale is not None:
+            return Flight('STALE', stale)
+        value = await _wait_for_value(cache_key)
+        if value is not None:
+            return Flight('HIT', value)
+
+    redis = FastAPICache.get_backend().redis
+    try:
+        started_at = time.perf_counter()
+        result = await call()
+        value = CachedValue(
+            FastAPICache.get_coder().encode(result),
+            time.time() + expire,
+            time.perf_counter() - started_at
+        )
+        try:
+            await redis.set(
+                cache_key,
+                value.pack(),
+                ex=expire + settings.CACHE_STALE_TTL_SECONDS
+            )
+        except Exception:
+            logger.warning(f"Error setting cache key '{cache_key}'", exc_info=True)
+    finally:
+        if locked:
+            try:
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception:
+                logger.warning(f"Error unlocking cache key '{lock_key}'", exc_info=True)
+    return Flight('MISS', value, result)
+
+
+def cache(
+    expire: int,
+    namespace: str,
+    key_builder: KeyBuilder,
+    injected_dependency_namespace: str = '__fastapi_cache',
+    serialized: bool = False,
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """fastapi_cache's @cache with single-flight recomputation.
+
+    Only one caller recomputes a missing or expiring key: callers in this
+    process share an asyncio future, other processes are held off by a Redis
+    lock and serve the stale value (kept CACHE_STALE_TTL_SECONDS past expiry)
+    or wait for the fresh one.
+
+    With serialized=True the encoded value is sent as the response body,
+    skipping response_model validation: the function must return trusted,
+    JSON-ready data.
+    """
+    injected_request = Parameter(
+        name=f'{injected_dependency_namespace}_request',
+        annotation=Request,
+        kind=Parameter.KEYWORD_ONLY,
+    )
+    injected_response = Parameter(
+        name=f'{injected_dependency_namespace}_response',
+        annotation=Response,
+        kind=Parameter.KEYWORD_ONLY,
+    )
+
+    def wrapper(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        wrapped_signature = get_typed_signature(func)
+        to_inject: list[Parameter] = []
+        request_param = _locate_param(wrapped_signature, injected_request, to_inject)
+        response_param = _locate_param(wrapped_signature, injected_response, to_inject)
+        return_type = get_typed_return_annotation(func)
+
+        def respond(
+            flight: Flight,
+            request: Request | None,
+            response: Response | None
+        ):
+            etag = f'W/{hash(flight.value.payload)}'
+            max_age = max(0, int(flight.value.fresh_until - time.time()))
+            headers = {
+                'Cache-Control': f'max-age={max_age}',
+                'ETag': etag,
+                FastAPICache.get_cache_status_header(): flight.status,
+            }
+            if (
+                flight.status != 'MISS'
+                and request
+                and request.headers.get('if-none-match') == etag
+            ):
+                return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+            if serialized:
+                return Response(
+                    flight.value.payload,
+                    media_type='application/json',
+                    headers=headers
+                )
+            if response:
+                response.headers.update(headers)
+            if flight.status == 'MISS':
+                return flight.result
+            return FastAPICache.get_coder().decode_as_type(
+                flight.value.payload,
+                type_=return_type
+            )
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            request: Request | None = kwargs.get(request_param.name)
+            response: Response | None = kwargs.get(response_param.name)
+            call_kwargs = {
+                name: value for name, value in kwargs.items()
+                if name not in (injected_request.name, injected_response.name)
+            }
+
+            if _uncacheable(request):
+                result = await func(*args, **call_kwargs)
+                if serialized:
+                    return Response(
+                        FastAPICache.get_coder().encode(result),
+                        media_type='application/json'
+                    )
+                return result
+
+            cache_key = key_builder(
+                func,
+                f'{FastAPICache.get_prefix()}:{namespace}',
+                request=request,
+                response=response,
+                args=args,
+                kwargs={
+                    name: value for name, value in kwargs.items()
+                    if name not in (request_param.name, response_param.name)
+                },
+            )
+            if isawaitable(cache_key):
+                cache_key = await cache_key
+
+            try:
+                _, cached = await FastAPICache.get_backend().get_with_ttl(cache_key)
+            except Exception:
+                logger.warning(f"Error retrieving cache key '{cache_key}'", exc_info=True)
+                cached = None
+
+            stale = None
+            if cached is not None:
+                try:
+                    stale = CachedValue.unpack(cached)
+                except ValueError:
+                    # Written in another format, e.g. by fastapi_cache's @cache
+                    pass
+            if stale is not None:
+                if stale.is_fresh():
+                    return respond(Flight('HIT', stale), request, response)
+
+            while True:
+                flight = _flights.get(cache_key)
+                if flight is not None and stale is not None:
+                    return respond(Flight('STALE', stale), request, response)
+                if flight is None:
+                    flight = asyncio.get_running_loop().create_future()
+                    _flights[cache_key] = flight
+                    try:
+                        flight.set_result(await _recompute(
+                            cache_key,
+                            expire,
+                            lambda: func(*args, **call_kwargs),
+                            stale
+                        ))
+                    except Exception as e:
+                        flight.set_exception(e)
+                        # Waiters get the exception too; without them it is not "lost"
+                        flight.exception()
+                        raise
+                    finally:
+                        _flights.pop(cache_key, None)
+                        if not flight.done():
+                            # The leader was cancelled: wake the waiters up
+                            flight.cancel()
+                try:
+                    return respond(await asyncio.shield(flight), request, response)
+                except asyncio.CancelledError:
+                    # Only the leader was cancelled: a waiter takes over
+                    if not flight.cancelled() or asyncio.current_task().cancelling():
+                        raise
+
+        inner.__signature__ = _augment_signature(wrapped_signature, *to_inject)
+        return inner
+
+    return wrapper
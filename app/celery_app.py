@@ -1,12 +1,20 @@
 from celery import Celery
 from celery.schedules import crontab
-from celery.signals import worker_process_init
-
-from background_tasks.utils import init_fastapi_cache
-from settings import settings
+import os
+import time
 
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown
+)
+from prometheus_client import multiprocess, start_http_server
 
-init_fastapi_cache()
+from background_tasks.runtime import runtime
+from metrics import CELERY_TASK_DURATION, CELERY_TASK_ROWS, get_registry
+from settings import settings
 
 celery = Celery(
     __name__,
@@ -15,11 +23,50 @@ celery = Celery(
     include=['background_tasks.tasks']
 )
 
+
+_task_started_at: dict[str, float] = {}
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    if not settings.CELERY_METRICS_PORT:
+        return
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        # Files left by a previous run would be merged into the new totals
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for name in os.listdir(multiproc_dir):
+            os.remove(os.path.join(multiproc_dir, name))
+    start_http_server(settings.CELERY_METRICS_PORT, registry=get_registry())
+
+
 @worker_process_init.connect
 def configure_worker(**kwargs):
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    runtime.start()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker(**kwargs):
+    runtime.stop()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@task_prerun.connect
+def record_task_start(task_id: str, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_metrics(task_id: str, task, retval=None, state: str | None = None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(
+            time.perf_counter() - started_at
+        )
+    if isinstance(retval, int):
+        CELERY_TASK_ROWS.labels(task.name).inc(retval)
+
 
 celery.autodiscover_tasks()
 
@@ -31,6 +78,18 @@ celery.conf.beat_schedule = {
     'set-expired-links': {
         'task': 'background_tasks.tasks.set_expired_links',
         'schedule': 300
+    },
+    'cleanup-link-clicks': {
+        'task': 'background_tasks.tasks.cleanup_link_clicks',
+        'schedule': crontab(minute=30, hour=0),
+    },
+    'flush-link-clicks': {
+        'task': 'background_tasks.tasks.flush_link_clicks',
+        'schedule': settings.CLICKS_FLUSH_INTERVAL_SECONDS
+    },
+    'rebuild-short-codes-filter': {
+        'task': 'background_tasks.tasks.rebuild_short_codes_filter',
+        'schedule': settings.SHORT_CODES_FILTER_REBUILD_INTERVAL_SECONDS
     }
 }
 celery.conf.timezone = 'UTC'
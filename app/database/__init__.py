@@ -1,3 +1,3 @@
-from database.database import get_db_session, Base
+from database.database import get_db_session, get_read_db_session, shard_sessions_scope, Base
 
-__all__ = ['get_db_session', 'Base']
+__all__ = ['get_db_session', 'get_read_db_session', 'shard_sessions_scope', 'Base']
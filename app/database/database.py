@@ -1,16 +1,96 @@
-from typing import Any
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator
 
 from sqlalchemy.orm import DeclarativeBase, declared_attr
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine
+)
 
+from database.replica import ReplicaLagGuard
+from metrics import DB_READ_SESSIONS, MeteredAsyncAdaptedQueuePool, instrument_engine
 from settings import settings
 
-engine = create_async_engine(settings.db_url, future=True, echo=True, pool_pre_ping=True)
-AsyncSessionFactory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
+def make_engine(url: str = settings.db_url) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        future=True,
+        echo=settings.DB_ECHO,
+        pool_pre_ping=True,
+        poolclass=MeteredAsyncAdaptedQueuePool
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
 
-async def get_db_session() -> AsyncSession:
-    async with AsyncSessionFactory() as session:
+
+def make_session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+engine = make_engine()
+AsyncSessionFactory = make_session_factory(engine)
+
+# Link shards beyond the primary, which is shard 0
+shard_engines = [make_engine(url) for url in settings.LINK_SHARD_DB_URLS]
+ShardSessionFactories = [make_session_factory(shard_engine) for shard_engine in shard_engines]
+
+replica_engine: AsyncEngine | None = None
+ReplicaSessionFactory: async_sessionmaker[AsyncSession] | None = None
+replica_lag_guard: ReplicaLagGuard | None = None
+if settings.replica_db_url:
+    replica_engine = make_engine(settings.replica_db_url)
+    ReplicaSessionFactory = make_session_factory(replica_engine)
+    replica_lag_guard = ReplicaLagGuard(
+        replica_engine,
+        max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS
+    )
+
+
+@asynccontextmanager
+async def session_scope(
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionFactory
+) -> AsyncIterator[AsyncSession]:
+    # One transaction per unit of work: repositories only execute,
+    # the scope commits once at the end or rolls back on error
+    async with session_factory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+@asynccontextmanager
+async def shard_sessions_scope(
+    db_session: AsyncSession,
+    session_factories: list[async_sessionmaker[AsyncSession]] = ShardSessionFactories
+) -> AsyncIterator[list[AsyncSession]]:
+    # The primary session is shard 0, the other shards get a scope each
+    async with AsyncExitStack() as stack:
+        yield [db_session] + [
+            await stack.enter_async_context(session_scope(session_factory))
+            for session_factory in session_factories
+        ]
+
+
+async def get_db_session() -> AsyncIterator[AsyncSession]:
+    async with session_scope() as session:
+        yield session
+
+
+async def get_read_db_session() -> AsyncIterator[AsyncSession | None]:
+    # None means "read from the primary session": no replica or it lags behind
+    if replica_lag_guard is None or not await replica_lag_guard.is_usable():
+        DB_READ_SESSIONS.labels('primary').inc()
+        yield None
+        return
+    DB_READ_SESSIONS.labels('replica').inc()
+    async with session_scope(ReplicaSessionFactory) as session:
         yield session
 
 
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from metrics import DB_REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+# Zero when the replica has replayed everything it received: on an idle
+# primary the last replayed transaction gets old without any real lag
+REPLICA_LAG_QUERY = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+
+class ReplicaLagGuard:
+    """Tells whether the replica is close enough to the primary to serve reads.
+
+    The lag is checked at most once per check_interval; an unreachable
+    replica counts as lagging.
+    """
+
+    def __init__(self, engine: AsyncEngine, max_lag: float, check_interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._usable = False
+        self._checked_at: float | None = None
+
+    async def is_usable(self) -> bool:
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._usable
+        # Set before awaiting so concurrent requests reuse the previous answer
+        self._checked_at = now
+        try:
+            async with self.engine.connect() as connection:
+                lag = float((await connection.execute(REPLICA_LAG_QUERY)).scalar_one())
+        except Exception:
+            logger.warning('Replica lag check failed, reading from the primary', exc_info=True)
+            self._usable = False
+        else:
+            DB_REPLICA_LAG.set(lag)
+            self._usable = lag <= self.max_lag
+        return self._usable
@@ -1,66 +1,136 @@
+from typing import AsyncIterator
+
 import httpx
 from fastapi import Depends, security, Security, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db_session
+from database import get_db_session, get_read_db_session, shard_sessions_scope
 from exceptions import (
     InvalidTokenException,
     TokenExpiredException,
     UserNotFound
 )
-from repository import LinksRepository, UsersRepository, LinksCache
+from repository import (
+    LinksRepository,
+    UsersRepository,
+    LinksCache,
+    LinkClicksBuffer,
+    ShortCodesFilter,
+    SweepProgress,
+    UsersCache,
+    LinkBucketMap,
+    ShardedLinksRepository
+)
 from security import reusable_oauth2
 from service import LinksService, AuthService, UserService
 from settings import settings
 
 
-async def get_links_repository(
+link_bucket_map = LinkBucketMap(
+    shard_count=len(settings.LINK_SHARD_DB_URLS) + 1,
+    refresh_interval=settings.LINK_SHARD_MAP_REFRESH_SECONDS
+)
+
+
+async def get_shard_db_sessions(
     db_session: AsyncSession = Depends(get_db_session)
-) -> LinksRepository:
-    return LinksRepository(db_session)
+) -> AsyncIterator[list[AsyncSession]]:
+    async with shard_sessions_scope(db_session) as shard_sessions:
+        yield shard_sessions
+
+
+async def get_links_repository(
+    shard_sessions: list[AsyncSession] = Depends(get_shard_db_sessions),
+    read_session: AsyncSession | None = Depends(get_read_db_session)
+) -> ShardedLinksRepository:
+    await link_bucket_map.refresh(shard_sessions[0])
+    return ShardedLinksRepository(
+        [LinksRepository(shard_sessions[0], read_session)]
+        + [LinksRepository(shard_session) for shard_session in shard_sessions[1:]],
+        link_bucket_map
+    )
 
 
 async def get_links_cache_repository() -> LinksCache:
     return LinksCache()
 
 
+async def get_link_clicks_buffer() -> LinkClicksBuffer:
+    return LinkClicksBuffer(lock_timeout=settings.CLICKS_FLUSH_LOCK_TIMEOUT_SECONDS)
+
+
+async def get_short_codes_filter() -> ShortCodesFilter:
+    return ShortCodesFilter(
+        capacity=settings.SHORT_CODES_FILTER_CAPACITY,
+        error_rate=settings.SHORT_CODES_FILTER_ERROR_RATE,
+        negative_ttl=settings.REDIRECT_NEGATIVE_CACHE_TTL_SECONDS,
+        rebuild_timeout=settings.SHORT_CODES_FILTER_REBUILD_INTERVAL_SECONDS
+    )
+
+
+async def get_sweep_progress() -> SweepProgress:
+    return SweepProgress()
+
+
 async def get_links_service(
     request: Request,
-    links_repo: LinksRepository = Depends(get_links_repository),
+    links_repo: ShardedLinksRepository = Depends(get_links_repository),
     links_cache: LinksCache = Depends(get_links_cache_repository),
+    clicks_buffer: LinkClicksBuffer = Depends(get_link_clicks_buffer),
+    short_codes_filter: ShortCodesFilter = Depends(get_short_codes_filter),
+    sweep_progress: SweepProgress = Depends(get_sweep_progress),
 ) -> LinksService:
     return LinksService(
         links_repo=links_repo,
         links_cache=links_cache,
+        clicks_buffer=clicks_buffer,
+        short_codes_filter=short_codes_filter,
+        sweep_progress=sweep_progress,
         settings=settings,
         request=request,
     )
 
 
 async def get_users_repository(
-    db_session: AsyncSession = Depends(get_db_session)
+    db_session: AsyncSession = Depends(get_db_session),
+    read_session: AsyncSession | None = Depends(get_read_db_session)
 ) -> UsersRepository:
-    return UsersRepository(db_session)
+    return UsersRepository(db_session, read_session)
 
 
 async def get_async_client() -> httpx.AsyncClient:
     return httpx.AsyncClient()
 
 
+async def get_users_cache_repository() -> UsersCache:
+    return UsersCache(
+        ttl=settings.USER_CACHE_TTL_SECONDS,
+        max_size=settings.USER_CACHE_MAX_SIZE,
+        use_redis=settings.USER_CACHE_REDIS_ENABLED
+    )
+
+
 async def get_auth_service(
-    users_repo: UsersRepository = Depends(get_users_repository)
+    users_repo: UsersRepository = Depends(get_users_repository),
+    users_cache: UsersCache = Depends(get_users_cache_repository)
 ) -> AuthService:
     return AuthService(
         user_repo=users_repo,
+        users_cache=users_cache,
         settings=settings
     )
 
 
 async def get_users_service(
     users_repo: UsersRepository = Depends(get_users_repository),
+    users_cache: UsersCache = Depends(get_users_cache_repository),
     auth_service: AuthService = Depends(get_auth_service)
 ) -> UserService:
-    return UserService(user_repo=users_repo, auth_service=auth_service)
+    return UserService(
+        user_repo=users_repo,
+        users_cache=users_cache,
+        auth_service=auth_service
+    )
 
 
 async def get_request_user_id(
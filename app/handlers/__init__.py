@@ -1,5 +1,6 @@
 from handlers.users import router as users_router
 from handlers.auth import router as auth_router
 from handlers.links import router as links_router
+from handlers.metrics import router as metrics_router
 
-routers = [users_router, auth_router, links_router]
+routers = [users_router, auth_router, links_router, metrics_router]
@@ -1,11 +1,10 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Body, Depends, Request, status, HTTPException
 from fastapi.params import Param
 from fastapi.responses import RedirectResponse
-from fastapi_cache.decorator import cache
-from pydantic import AnyHttpUrl
 
+from caching import cache
 from dependency import get_links_service, get_request_user_id
 from exceptions import (
     LinkNotFound,
@@ -16,47 +15,58 @@ from repository import LinksCache
 from schemas import (
     LinkSchema,
     LinkCreateSchema,
+    LinkBatchItemSchema,
     LinkStatsSchema,
+    LinkStatsParams,
     CreateLinkParams,
-    LinkUpdateSchema
+    LinkUpdateSchema,
+    LinkPageSchema,
+    LinksPageParams,
+    LinksSearchParams
 )
 from service import LinksService
+from settings import settings
 
 router = APIRouter(prefix='/links', tags=['links'])
 
 
-@router.get('/expired', response_model=list[LinkSchema])
+@router.get('/expired', response_model=LinkPageSchema)
 @cache(
     expire=600,
     namespace='expired_links',
+    serialized=True,
     key_builder=LinksCache.expired_key_builder
 )
 async def get_expired_links(
+    params: Annotated[LinksPageParams, Param()],
     link_service: Annotated[LinksService, Depends(get_links_service)]
 ):
-    return await link_service.get_expired_links()
+    return await link_service.get_expired_links(params)
 
 
-@router.get('/search', response_model=list[LinkSchema])
+@router.get('/search', response_model=LinkPageSchema)
 @cache(
     expire=600,
     namespace='search_link',
+    serialized=True,
     key_builder=LinksCache.original_url_key_builder
 )
 async def search_links(
-    original_url: Annotated[AnyHttpUrl, Param()],
+    params: Annotated[LinksSearchParams, Param()],
     link_service: Annotated[LinksService, Depends(get_links_service)],
 ):
-    return await link_service.search_links_by_original_url(original_url)
+    return await link_service.search_links_by_original_url(params)
 
 
-@router.get('/my', response_model=list[LinkSchema])
+@router.get('/my', response_model=LinkPageSchema)
 @cache(
     expire=600,
     namespace='my_links',
+    serialized=True,
     key_builder=LinksCache.user_id_key_builder
 )
 async def get_my_links(
+    params: Annotated[LinksPageParams, Param()],
     link_service: Annotated[LinksService, Depends(get_links_service)],
     user_id: int | None = Depends(get_request_user_id),
 ):
@@ -65,26 +75,43 @@ async def get_my_links(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Not authorized user'
         )
-    return await link_service.get_user_links(user_id)
+    return await link_service.get_user_links(user_id, params)
 
 
-@router.get('/{short_code}/stats', response_model=LinkStatsSchema)
 @cache(
     expire=300,
     namespace='link_stats',
     key_builder=LinksCache.short_code_key_builder
 )
+async def _get_cached_link_stats(
+    short_code: str,
+    link_service: LinksService
+) -> LinkStatsSchema:
+    return await link_service.get_link_stats(short_code)
+
+
+@router.get('/{short_code}/stats', response_model=LinkStatsSchema)
 async def get_link_stats(
     short_code: str,
+    params: Annotated[LinkStatsParams, Param()],
     link_service: Annotated[LinksService, Depends(get_links_service)]
 ):
     try:
-        return await link_service.get_link_stats(short_code)
+        stats = await _get_cached_link_stats(
+            short_code=short_code,
+            link_service=link_service
+        )
     except LinkNotFound as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=e.detail
         )
+    stats = await link_service.add_pending_clicks(short_code, stats)
+    if params.granularity:
+        stats = stats.model_copy(update={
+            'clicks': await link_service.get_link_clicks(short_code, params)
+        })
+    return stats
 
 
 @router.post(
@@ -107,13 +134,34 @@ async def create_link(
         )
 
 
+@router.post(
+    '/shorten/batch',
+    response_model=list[LinkBatchItemSchema],
+    status_code=status.HTTP_201_CREATED
+)
+async def create_links_batch(
+    links: Annotated[
+        list[LinkCreateSchema],
+        Body(min_length=1, max_length=settings.LINKS_BATCH_MAX_SIZE)
+    ],
+    params: Annotated[CreateLinkParams, Param()],
+    link_service: Annotated[LinksService, Depends(get_links_service)],
+    user_id: int | None = Depends(get_request_user_id),
+):
+    return await link_service.create_links(links, params.expires_at, user_id)
+
+
 @router.get('/{short_code}', response_class=RedirectResponse)
 async def redirect_to_original_url(
     short_code: str,
+    request: Request,
     link_service: Annotated[LinksService, Depends(get_links_service)]
 ):
     try:
-        original_url = await link_service.get_original_url_by_short_code(short_code)
+        original_url = await link_service.get_original_url_by_short_code(
+            short_code,
+            cache_checked=getattr(request.state, 'redirect_cache_checked', False)
+        )
         return RedirectResponse(url=original_url)
     except LinkNotFound as e:
         raise HTTPException(
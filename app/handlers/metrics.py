@@ -0,0 +1,70 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from dependency import get_short_codes_filter
+from metrics import (
+    SHORT_CODES_FILTER_ESTIMATED_FPR,
+    SHORT_CODES_FILTER_MEMORY,
+    get_registry
+)
+from repository import ShortCodesFilter
+from repository.short_codes_filter import short_codes_filter_stats
+from security import password_hashing_queue_stats
+
+router = APIRouter(tags=['metrics'])
+
+
+class ProcessStatsCollector:
+    # Counters kept by this process outside of prometheus_client
+    def collect(self):
+        yield CounterMetricFamily(
+            'password_hashing_tasks',
+            'Password hashing tasks run on the thread pool',
+            value=password_hashing_queue_stats.tasks
+        )
+        yield CounterMetricFamily(
+            'password_hashing_queue_seconds',
+            'Total time password hashing tasks waited for a thread',
+            value=password_hashing_queue_stats.queue_time_seconds_total
+        )
+        yield GaugeMetricFamily(
+            'password_hashing_queue_max_seconds',
+            'Longest wait for a password hashing thread',
+            value=password_hashing_queue_stats.queue_time_seconds_max
+        )
+        checks = CounterMetricFamily(
+            'short_codes_filter_checks',
+            'Unknown short code checks by outcome',
+            labels=['outcome']
+        )
+        checks.add_metric(['rejected'], short_codes_filter_stats.rejected)
+        checks.add_metric(['negative_cache_hit'], short_codes_filter_stats.negative_cache_hits)
+        checks.add_metric(['passed'], short_codes_filter_stats.passed)
+        checks.add_metric(['false_positive'], short_codes_filter_stats.false_positives)
+        yield checks
+        yield GaugeMetricFamily(
+            'short_codes_filter_false_positive_rate',
+            'Observed share of filter passes that were not found in the database',
+            value=short_codes_filter_stats.false_positive_rate
+        )
+
+
+process_stats_collector = ProcessStatsCollector()
+REGISTRY.register(process_stats_collector)
+
+
+@router.get('/metrics', include_in_schema=False)
+async def get_metrics(
+    short_codes_filter: Annotated[ShortCodesFilter, Depends(get_short_codes_filter)]
+):
+    memory, estimated_fpr = await short_codes_filter.get_usage()
+    SHORT_CODES_FILTER_MEMORY.set(memory)
+    SHORT_CODES_FILTER_ESTIMATED_FPR.set(estimated_fpr)
+
+    registry = get_registry()
+    if registry is not REGISTRY:
+        registry.register(process_stats_collector)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
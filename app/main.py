@@ -2,22 +2,27 @@ from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from redis import asyncio as aioredis
 
+from caching import ORJSONCoder
 from handlers import routers
+from metrics import MeteredRedisBackend, MetricsMiddleware
+from middleware import RedirectFastPathMiddleware
 from settings import settings
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
     redis = aioredis.from_url(settings.REDIS_URL)
-    FastAPICache.init(RedisBackend(redis), prefix='links-cache')
+    FastAPICache.init(MeteredRedisBackend(redis), prefix='links-cache', coder=ORJSONCoder)
     yield
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(RedirectFastPathMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 for router in routers:
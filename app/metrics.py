@@ -0,0 +1,150 @@
+import os
+import time
+
+from fastapi_cache.backends.redis import RedisBackend
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route template',
+    ['method', 'route', 'status']
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by namespace and result',
+    ['namespace', 'result']
+)
+DB_STATEMENT_DURATION = Histogram(
+    'db_statement_duration_seconds',
+    'SQL statement execution time by operation and table',
+    ['operation', 'table'],
+    buckets=FAST_BUCKETS
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    'db_pool_checkout_duration_seconds',
+    'Time spent waiting for a pooled connection (including connecting)',
+    buckets=FAST_BUCKETS
+)
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds',
+    'Celery task run time',
+    ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+)
+CELERY_TASK_ROWS = Counter(
+    'celery_task_rows_total',
+    'Rows affected by Celery tasks',
+    ['task']
+)
+DB_REPLICA_LAG = Gauge(
+    'db_replica_lag_seconds',
+    'Replay lag of the read replica, as last checked',
+    multiprocess_mode='mostrecent'
+)
+DB_READ_SESSIONS = Counter(
+    'db_read_sessions_total',
+    'Read-only sessions by the database they were routed to',
+    ['target']
+)
+SHORT_CODES_FILTER_MEMORY = Gauge(
+    'short_codes_filter_memory_bytes',
+    'Memory used by the short codes Bloom filter',
+    multiprocess_mode='mostrecent'
+)
+SHORT_CODES_FILTER_ESTIMATED_FPR = Gauge(
+    'short_codes_filter_estimated_false_positive_rate',
+    'False positive rate implied by the Bloom filter fill ratio',
+    multiprocess_mode='mostrecent'
+)
+
+
+def get_registry() -> CollectorRegistry:
+    # Prefork Celery workers (and multi-process uvicorn) share metrics through files
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.labels(
+                scope['method'],
+                route.path if route else scope.get('route_path', 'unmatched'),
+                status
+            ).observe(time.perf_counter() - started_at)
+
+
+class MeteredRedisBackend(RedisBackend):
+    async def get_with_ttl(self, key: str):
+        ttl, cached = await super().get_with_ttl(key)
+        # Keys look like "<prefix>:<namespace>:..."
+        CACHE_REQUESTS.labels(
+            key.split(':', 2)[1],
+            'hit' if cached is not None else 'miss'
+        ).inc()
+        return ttl, cached
+
+
+class MeteredAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_DURATION.observe(time.perf_counter() - started_at)
+
+
+def _statement_labels(context) -> tuple[str, str]:
+    operation = context.statement.lstrip().split(None, 1)[0].upper()
+    statement = getattr(context.compiled, 'statement', None)
+    table = getattr(statement, 'table', None)
+    if table is None and hasattr(statement, 'get_final_froms'):
+        froms = statement.get_final_froms()
+        table = froms[0] if froms else None
+    return operation, getattr(table, 'name', None) or 'unknown'
+
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started_at = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_STATEMENT_DURATION.labels(*_statement_labels(context)).observe(
+            time.perf_counter() - context.metrics_started_at
+        )
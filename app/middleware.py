@@ -0,0 +1,51 @@
+import datetime as dt
+from urllib.parse import quote
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from repository import LinksCache, LinkClicksBuffer
+
+# GET routes under /links/ that are not short codes
+RESERVED_LINK_PATHS = frozenset({'expired', 'search', 'my'})
+REDIRECT_ROUTE_PATH = '/links/{short_code}'
+
+
+class RedirectFastPathMiddleware:
+    """Answers cached GET /links/{short_code} before FastAPI routing and DI run."""
+
+    def __init__(self, app: ASGIApp, prefix: str = '/links/'):
+        self.app = app
+        self.prefix = prefix
+        self._links_cache: LinksCache | None = None
+        self._clicks_buffer: LinkClicksBuffer | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            return await self.app(scope, receive, send)
+
+        path: str = scope['path']
+        short_code = path[len(self.prefix):] if path.startswith(self.prefix) else ''
+        if not short_code or '/' in short_code or short_code in RESERVED_LINK_PATHS:
+            return await self.app(scope, receive, send)
+
+        # Built on first use: the cache backend is initialized in the lifespan
+        if self._links_cache is None:
+            self._links_cache = LinksCache()
+            self._clicks_buffer = LinkClicksBuffer()
+
+        original_url = await self._links_cache.get_original_url(short_code)
+        if original_url is None:
+            # The handler skips the cache lookup that already missed here
+            scope.setdefault('state', {})['redirect_cache_checked'] = True
+            return await self.app(scope, receive, send)
+
+        await self._clicks_buffer.record_click(short_code, dt.datetime.now(dt.UTC))
+        scope['route_path'] = REDIRECT_ROUTE_PATH
+        # Same Location encoding as starlette's RedirectResponse
+        location = quote(original_url, safe=":/%#?=@[]!$&'()*+,;").encode('latin-1')
+        await send({
+            'type': 'http.response.start',
+            'status': 307,
+            'headers': [(b'content-length', b'0'), (b'location', location)],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
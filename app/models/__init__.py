@@ -1,5 +1,6 @@
-from models.links import Link
+from models.clicks import LinkClick, LinkClickHourly, LinkClickDaily
+from models.links import Link, LinkArchive, LinkShardBucket
 from models.users import User
 
 
-__all__ = ['User', 'Link']
+__all__ = ['User', 'Link', 'LinkArchive', 'LinkShardBucket', 'LinkClick', 'LinkClickHourly', 'LinkClickDaily']
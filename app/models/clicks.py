@@ -0,0 +1,44 @@
+import datetime as dt
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base
+
+
+class LinkClick(Base):
+    __tablename__ = 'link_clicks'
+    __table_args__ = (
+        Index('ix_link_clicks_clicked_at', 'clicked_at'),
+        Index('ix_link_clicks_link_id_clicked_at', 'link_id', 'clicked_at'),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    link_id: Mapped[int] = mapped_column(ForeignKey('links.id', ondelete='CASCADE'))
+    clicked_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
+
+
+class LinkClickHourly(Base):
+    __tablename__ = 'link_clicks_hourly'
+    __table_args__ = (
+        Index('ix_link_clicks_hourly_bucket', 'bucket'),
+    )
+
+    # No foreign key: rollups outlive the link in links_archive (which keeps
+    # its id) and are removed by retention only
+    link_id: Mapped[int] = mapped_column(primary_key=True)
+    bucket: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    clicks: Mapped[int] = mapped_column(default=0)
+
+
+class LinkClickDaily(Base):
+    __tablename__ = 'link_clicks_daily'
+    __table_args__ = (
+        Index('ix_link_clicks_daily_bucket', 'bucket'),
+    )
+
+    # No foreign key: rollups outlive the link in links_archive (which keeps
+    # its id) and are removed by retention only
+    link_id: Mapped[int] = mapped_column(primary_key=True)
+    bucket: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    clicks: Mapped[int] = mapped_column(default=0)
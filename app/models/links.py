@@ -1,7 +1,7 @@
 import datetime as dt
 from typing import Optional
 
-from sqlalchemy import ForeignKey, DateTime
+from sqlalchemy import DateTime, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database import Base
@@ -9,6 +9,17 @@ from database import Base
 
 class Link(Base):
     __tablename__ = 'links'
+    __table_args__ = (
+        Index('ix_links_original_url', 'original_url', postgresql_using='hash'),
+        Index('ix_links_user_id', 'user_id', 'id'),
+        Index(
+            'ix_links_expires_at',
+            'expires_at',
+            postgresql_where=text('expires_at IS NOT NULL')
+        ),
+    )
+    # Expired links are moved to links_archive
+    is_expired = False
 
     id: Mapped[int] = mapped_column(primary_key=True)
     original_url: Mapped[str]
@@ -21,5 +32,48 @@ class Link(Base):
     redirect_count: Mapped[int] = mapped_column(default=0)
     last_used_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime(timezone=True))
     expires_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime(timezone=True))
-    is_expired: Mapped[bool] = mapped_column(default=False)
-    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=True)
+    # Users live on the primary only, so shards cannot reference them
+    user_id: Mapped[int] = mapped_column(nullable=True)
+
+
+Index('ix_links_last_activity_at', func.coalesce(Link.last_used_at, Link.created_at))
+
+
+class LinkArchive(Base):
+    __tablename__ = 'links_archive'
+    __table_args__ = (
+        Index('ix_links_archive_short_code', 'short_code'),
+    )
+    is_expired = True
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    original_url: Mapped[str]
+    short_code: Mapped[str]
+    short_link: Mapped[str]
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
+    redirect_count: Mapped[int]
+    last_used_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime(timezone=True))
+    user_id: Mapped[Optional[int]]
+    archived_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now()
+    )
+
+
+Index(
+    'ix_links_archive_last_activity_at',
+    func.coalesce(LinkArchive.last_used_at, LinkArchive.created_at)
+)
+
+
+# Bucket to shard map, kept on the primary; buckets without a row are on shard 0
+class LinkShardBucket(Base):
+    __tablename__ = 'link_shard_buckets'
+
+    bucket: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    shard: Mapped[int]
+    # Set by move_link_buckets between the switch and the removal of the
+    # links left on the old shard, so an interrupted move can be finished
+    moving_from: Mapped[Optional[int]]
+    moving_after_id: Mapped[Optional[int]]
@@ -1,6 +1,21 @@
 from repository.cache_links import LinksCache
+from repository.cache_users import UsersCache
+from repository.clicks import LinkClicksBuffer
 from repository.links import LinksRepository
+from repository.shards import LinkBucketMap, ShardedLinksRepository
+from repository.short_codes_filter import ShortCodesFilter
+from repository.sweep_progress import SweepProgress
 from repository.users import UsersRepository
 
 
-__all__ = ['LinksRepository', 'LinksCache', 'UsersRepository']
+__all__ = [
+    'LinksRepository',
+    'LinkBucketMap',
+    'ShardedLinksRepository',
+    'LinksCache',
+    'LinkClicksBuffer',
+    'ShortCodesFilter',
+    'SweepProgress',
+    'UsersRepository',
+    'UsersCache'
+]
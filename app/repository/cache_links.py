@@ -1,6 +1,13 @@
+from collections.abc import Iterable, Sequence
+
 from fastapi_cache import FastAPICache
+from sqlalchemy import Row
 
+from metrics import CACHE_REQUESTS
 from models import Link
+from schemas import LinksPageParams
+
+PAGE_VERSION_TTL_SECONDS = 24 * 60 * 60
 
 
 class LinksCache:
@@ -14,44 +21,123 @@ class LinksCache:
         return f'{namespace}:{short_code}'
 
     @staticmethod
-    def expired_key_builder(func, namespace: str = "", *args, **kwargs):
-        return f'{namespace}:{func.__module__}:{func.__name__}'
+    async def _page_key(namespace: str, scope: str, params: LinksPageParams) -> str:
+        # Pages of one scope share a version, bumping it invalidates them all
+        version = await FastAPICache.get_backend().get(f'{namespace}:version:{scope}')
+        return f'{namespace}:{scope}:{int(version or 0)}:{params.limit}:{params.cursor or ""}'
+
+    @staticmethod
+    async def expired_key_builder(func, namespace: str = "", *args, **kwargs):
+        params = kwargs['kwargs']['params']
+        return await LinksCache._page_key(namespace, 'all', params)
 
     @staticmethod
-    def original_url_key_builder(func, namespace: str = "", *args, **kwargs):
-        original_url = kwargs['kwargs']['original_url']
-        return f'{namespace}:{original_url}'
+    async def original_url_key_builder(func, namespace: str = "", *args, **kwargs):
+        params = kwargs['kwargs']['params']
+        return await LinksCache._page_key(
+            namespace,
+            params.original_url.unicode_string(),
+            params
+        )
 
     @staticmethod
-    def user_id_key_builder(func, namespace: str = "", *args, **kwargs):
+    async def user_id_key_builder(func, namespace: str = "", *args, **kwargs):
         user_id = kwargs['kwargs']['user_id']
-        return f'{namespace}:{user_id}'
+        params = kwargs['kwargs']['params']
+        return await LinksCache._page_key(namespace, str(user_id), params)
+
+    def _redirect_key(self, short_code: str) -> str:
+        return f'{self.prefix}:redirect:{short_code}'
+
+    def _link_stats_key(self, short_code: str) -> str:
+        return f'{self.prefix}:link_stats:{short_code}'
+
+    async def get_original_url(self, short_code: str) -> str | None:
+        original_url = await self._redis.get(self._redirect_key(short_code))
+        CACHE_REQUESTS.labels('redirect', 'hit' if original_url else 'miss').inc()
+        return original_url.decode() if original_url else None
+
+    async def set_original_url(self, short_code: str, original_url: str, expire: int):
+        await self._redis.set(self._redirect_key(short_code), original_url.encode(), expire)
 
-    async def invalidate_search_link_cache(self, original_url: str):
-        await self._redis.clear(f'{self.prefix}:search_link', original_url)
+    async def _apply(
+        self,
+        unlink_keys: Iterable[str] = (),
+        page_scopes: Iterable[tuple[str, str]] = (),
+        original_urls: Iterable[tuple[str, str, int]] = (),
+        batch_size: int = 1000
+    ):
+        # Everything a mutation touches goes out in a single pipeline
+        unlink_keys = list(dict.fromkeys(unlink_keys))
+        async with self._redis.redis.pipeline(transaction=False) as pipe:
+            for start in range(0, len(unlink_keys), batch_size):
+                pipe.unlink(*unlink_keys[start:start + batch_size])
+            for namespace, scope in dict.fromkeys(page_scopes):
+                version_key = f'{self.prefix}:{namespace}:version:{scope}'
+                pipe.incr(version_key)
+                pipe.expire(version_key, PAGE_VERSION_TTL_SECONDS)
+            for short_code, original_url, expire in original_urls:
+                if expire > 0:
+                    pipe.set(self._redirect_key(short_code), original_url.encode(), ex=expire)
+            await pipe.execute()
 
-    async def invalidate_my_links_cache(self, user_id: int):
-        await self._redis.clear(f'{self.prefix}:my_links', str(user_id))
+    async def invalidate_links_stats_cache(self, short_codes: Iterable[str]):
+        await self._apply(unlink_keys=map(self._link_stats_key, short_codes))
 
-    async def invalidate_link_stats_cache(self, short_code: str):
-        await self._redis.clear(f'{self.prefix}:link_stats', short_code)
+    async def invalidate_link_cache_after_create(self, link: Link, redirect_expire: int):
+        await self._apply(
+            page_scopes=[
+                ('search_link', link.original_url),
+                ('my_links', str(link.user_id)),
+            ],
+            original_urls=[(link.short_code, link.original_url, redirect_expire)]
+        )
 
-    async def invalidate_expired_links_cache(self):
-        await self._redis.clear(f'{self.prefix}:expired_links')
+    async def invalidate_link_cache_after_batch_create(self, links: Sequence[Link]):
+        await self._apply(page_scopes=[
+            *(('search_link', link.original_url) for link in links),
+            *(('my_links', str(link.user_id)) for link in links),
+        ])
 
-    async def invalidate_link_cache_after_create(self, link: Link):
-        await self.invalidate_search_link_cache(link.original_url)
-        await self.invalidate_my_links_cache(link.user_id)
+    async def invalidate_link_cache_after_update(
+        self,
+        short_code: str,
+        old_original_url: str,
+        user_id: int | None,
+        updated_link: Link,
+        redirect_expire: int
+    ):
+        await self._apply(
+            unlink_keys=[
+                self._redirect_key(short_code),
+                self._link_stats_key(short_code),
+            ],
+            page_scopes=[
+                ('search_link', old_original_url),
+                ('search_link', updated_link.original_url),
+                ('my_links', str(user_id)),
+            ],
+            original_urls=[
+                (updated_link.short_code, updated_link.original_url, redirect_expire)
+            ]
+        )
 
-    async def invalidate_link_cache_after_update_delete(self, link: Link):
-        await self.invalidate_link_stats_cache(link.short_code)
-        await self.invalidate_search_link_cache(link.original_url)
-        await self.invalidate_my_links_cache(link.user_id)
+    async def invalidate_link_cache_after_delete(self, link: Link):
+        await self.invalidate_link_cache_for_bg_tasks([link], expired=False)
 
-    async def invalidate_link_cache_for_bg_tasks(self, links: list[Link]):
-        await self.invalidate_expired_links_cache()
-        for user_id in set([link.user_id for link in links]):
-            await self.invalidate_my_links_cache(user_id)
-        for link in links:
-            await self.invalidate_link_stats_cache(link.short_code)
-            await self.invalidate_search_link_cache(link.original_url)
+    async def invalidate_link_cache_for_bg_tasks(
+        self,
+        links: Sequence[Link | Row],
+        expired: bool = True
+    ):
+        await self._apply(
+            unlink_keys=[
+                *(self._redirect_key(link.short_code) for link in links),
+                *(self._link_stats_key(link.short_code) for link in links),
+            ],
+            page_scopes=[
+                *((('expired_links', 'all'),) if expired else ()),
+                *(('search_link', link.original_url) for link in links),
+                *(('my_links', str(link.user_id)) for link in links),
+            ]
+        )
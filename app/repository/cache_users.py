@@ -0,0 +1,43 @@
+import time
+
+from fastapi_cache import FastAPICache
+
+# Shared by every request of the process: user id -> monotonic expiry time
+_local_user_ids: dict[int, float] = {}
+
+
+class UsersCache:
+    # Users are never deleted, so a known id stays valid and entries only
+    # expire. Deleting users would need every worker's local dict cleared.
+    def __init__(self, ttl: int, max_size: int, use_redis: bool = False):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._redis = FastAPICache.get_backend() if use_redis else None
+        self.prefix = FastAPICache.get_prefix() if use_redis else None
+
+    def _user_key(self, user_id: int) -> str:
+        return f'{self.prefix}:user:{user_id}'
+
+    async def is_known_user(self, user_id: int) -> bool:
+        expires_at = _local_user_ids.get(user_id)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                return True
+            _local_user_ids.pop(user_id, None)
+
+        if self._redis and await self._redis.get(self._user_key(user_id)):
+            self._remember_locally(user_id)
+            return True
+        return False
+
+    async def add_user(self, user_id: int):
+        self._remember_locally(user_id)
+        if self._redis:
+            await self._redis.set(self._user_key(user_id), b'1', self.ttl)
+
+    def _remember_locally(self, user_id: int):
+        _local_user_ids.pop(user_id, None)
+        if len(_local_user_ids) >= self.max_size:
+            # Dicts keep insertion order, so the first entry is the oldest
+            _local_user_ids.pop(next(iter(_local_user_ids)))
+        _local_user_ids[user_id] = time.monotonic() + self.ttl
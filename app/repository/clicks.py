@@ -0,0 +1,138 @@
+import datetime as dt
+import uuid
+
+from fastapi_cache import FastAPICache
+
+# Takes the flush lock (KEYS[7]) for the run token ARGV[1], moves the live
+# buffers (KEYS[1], KEYS[3], KEYS[5]) into their flushing slots unless a
+# previous flush was not acknowledged, then returns whatever is waiting to be
+# flushed. Returns nothing while another run holds the lock, so an unacked
+# batch is only ever reapplied by one run
+TAKE_PENDING_SCRIPT = """
+if not redis.call('SET', KEYS[7], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return false
+end
+if redis.call('EXISTS', KEYS[2]) == 0 and redis.call('EXISTS', KEYS[6]) == 0 then
+    for i = 1, 5, 2 do
+        if redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('RENAME', KEYS[i], KEYS[i + 1])
+        end
+    end
+end
+return {
+    redis.call('HGETALL', KEYS[2]),
+    redis.call('HGETALL', KEYS[4]),
+    redis.call('LRANGE', KEYS[6], 0, -1)
+}
+"""
+
+# Drops the flushing slots (KEYS[2..4]) only for the run holding the lock
+ACK_PENDING_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2], KEYS[3], KEYS[4])
+return 1
+"""
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LinkClicksBuffer:
+    def __init__(self, lock_timeout: int = 60):
+        self.lock_timeout = lock_timeout
+        self._redis = FastAPICache.get_backend().redis
+        self.prefix = FastAPICache.get_prefix()
+        self._counts_key = f'{self.prefix}:clicks:counts'
+        self._last_used_key = f'{self.prefix}:clicks:last_used'
+        self._events_key = f'{self.prefix}:clicks:events'
+        self._flushing_counts_key = f'{self.prefix}:clicks:flushing:counts'
+        self._flushing_last_used_key = f'{self.prefix}:clicks:flushing:last_used'
+        self._flushing_events_key = f'{self.prefix}:clicks:flushing:events'
+        self._flush_lock_key = f'{self.prefix}:clicks:flush_lock'
+        self._token = uuid.uuid4().hex
+
+    @staticmethod
+    def _event(short_code: str, clicked_at: dt.datetime) -> str:
+        return f'{short_code}:{clicked_at.timestamp()}'
+
+    async def record_click(self, short_code: str, clicked_at: dt.datetime):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(self._counts_key, short_code, 1)
+            pipe.hset(self._last_used_key, short_code, clicked_at.timestamp())
+            pipe.rpush(self._events_key, self._event(short_code, clicked_at))
+            await pipe.execute()
+
+    async def record_event(self, short_code: str, clicked_at: dt.datetime):
+        # For clicks already counted in the database only the event is logged
+        await self._redis.rpush(self._events_key, self._event(short_code, clicked_at))
+
+    async def get_pending(self, short_code: str) -> tuple[int, dt.datetime | None]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hget(self._counts_key, short_code)
+            pipe.hget(self._flushing_counts_key, short_code)
+            pipe.hget(self._last_used_key, short_code)
+            pipe.hget(self._flushing_last_used_key, short_code)
+            count, flushing_count, last_used, flushing_last_used = await pipe.execute()
+
+        timestamps = [float(ts) for ts in (last_used, flushing_last_used) if ts]
+        return (
+            int(count or 0) + int(flushing_count or 0),
+            dt.datetime.fromtimestamp(max(timestamps), dt.UTC) if timestamps else None
+        )
+
+    async def take_pending(
+        self
+    ) -> tuple[list[tuple[str, int, dt.datetime]], list[tuple[str, dt.datetime]]]:
+        pending = await self._redis.eval(
+            TAKE_PENDING_SCRIPT,
+            7,
+            self._counts_key,
+            self._flushing_counts_key,
+            self._last_used_key,
+            self._flushing_last_used_key,
+            self._events_key,
+            self._flushing_events_key,
+            self._flush_lock_key,
+            self._token,
+            self.lock_timeout
+        )
+        if not pending:
+            # Another flush is running
+            return [], []
+        counts, last_used, events = pending
+        last_used = dict(zip(last_used[::2], last_used[1::2]))
+        now = dt.datetime.now(dt.UTC)
+        clicks = [
+            (
+                short_code.decode(),
+                int(count),
+                dt.datetime.fromtimestamp(float(last_used[short_code]), dt.UTC)
+                if short_code in last_used else now
+            )
+            for short_code, count in zip(counts[::2], counts[1::2])
+        ]
+        return clicks, [
+            (short_code, dt.datetime.fromtimestamp(float(clicked_at), dt.UTC))
+            for short_code, clicked_at in (event.decode().rsplit(':', 1) for event in events)
+        ]
+
+    async def ack_pending(self):
+        await self._redis.eval(
+            ACK_PENDING_SCRIPT,
+            4,
+            self._flush_lock_key,
+            self._flushing_counts_key,
+            self._flushing_last_used_key,
+            self._flushing_events_key,
+            self._token
+        )
+
+    async def release_pending(self):
+        # An unacked batch stays in the flushing slots for the next run
+        await self._redis.eval(RELEASE_LOCK_SCRIPT, 1, self._flush_lock_key, self._token)
@@ -1,89 +1,205 @@
 import datetime as dt
+from collections.abc import AsyncIterator, Sequence
 
-from sqlalchemy import select, delete, update
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    Row,
+    Select,
+    String,
+    column,
+    delete,
+    false,
+    func,
+    or_,
+    select,
+    true,
+    tuple_,
+    update,
+    values
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Link
-from schemas import LinkCreateSchema, LinkUpdateStatsSchema
+from models import Link, LinkArchive, LinkClick, LinkClickHourly, LinkClickDaily
+from schemas import LinkCreateSchema
 
 
 class LinksRepository:
-    def __init__(self, db_session: AsyncSession):
+    def __init__(self, db_session: AsyncSession, read_session: AsyncSession | None = None):
         self.db_session = db_session
+        # Uncached read-only queries that tolerate replica lag. Lists and stats
+        # stay on db_session: they are recomputed right after a write
+        # invalidates their cache entry and would cache the lagging result
+        self.read_session = read_session or db_session
 
-    async def get_all_links(self) -> list[Link]:
-        async with self.db_session as session:
-            links: list[Link] = list((await session.execute(select(Link))).scalars().all())
-        return links
+    async def commit(self) -> None:
+        await self.db_session.commit()
 
-    async def get_link_by_id(self, link_id: id) -> Link | None:
-        async with self.db_session as session:
-            link: Link = (
-                await session.execute(
+    @staticmethod
+    def _paginate(
+        query: Select,
+        limit: int,
+        before_id: int | None,
+        model: type[Link | LinkArchive] = Link
+    ) -> Select:
+        if before_id is not None:
+            query = query.where(model.id < before_id)
+        # One extra row tells whether there is a next page
+        return query.order_by(model.id.desc()).limit(limit + 1)
+
+    async def get_user_links(
+        self,
+        user_id: int,
+        limit: int,
+        before_id: int | None = None
+    ) -> Sequence[Row]:
+        return (
+            await self.db_session.execute(
+                self._paginate(
                     select(
-                        Link
+                        Link.__table__,
+                        false().label('is_expired')
                     ).where(
-                        Link.id == link_id,
-                        Link.is_expired == False
-                    )
+                        Link.user_id == user_id
+                    ),
+                    limit,
+                    before_id
                 )
-            ).scalar_one_or_none()
+            )
+        ).all()
+
+    async def get_link(self, short_code: str) -> Link | None:
+        link: Link = (
+            await self.db_session.execute(
+                select(
+                    Link
+                ).where(
+                    Link.short_code == short_code
+                )
+            )
+        ).scalar_one_or_none()
         return link
 
-    async def get_user_links(self, user_id: int) -> list[Link]:
-        async with self.db_session as session:
-            links: list[Link] = list((
-                 await session.execute(
-                     select(
-                         Link
-                     ).where(
-                         Link.user_id == user_id,
-                         Link.is_expired == False
-                     )
-                 )
-             ).scalars().all())
-        return links
+    @staticmethod
+    def _archived_link(short_code: str, *columns) -> Select:
+        # An archived code can be reused: the latest archived link wins
+        return select(
+            *columns
+        ).where(
+            LinkArchive.short_code == short_code
+        ).order_by(
+            LinkArchive.archived_at.desc()
+        ).limit(1)
 
-    async def get_link(self, short_code: str) -> Link | None:
-        async with self.db_session as session:
-            link: Link = (
-                await session.execute(
-                    select(
-                        Link
-                    ).where(
-                        Link.short_code == short_code,
-                        Link.is_expired == False
+    async def get_link_stats(self, short_code: str) -> Row | None:
+        stats = (
+            await self.db_session.execute(
+                select(
+                    Link.original_url,
+                    Link.created_at,
+                    Link.redirect_count,
+                    Link.last_used_at
+                ).where(
+                    Link.short_code == short_code
+                )
+            )
+        ).one_or_none()
+        if stats is None:
+            stats = (
+                await self.db_session.execute(
+                    self._archived_link(
+                        short_code,
+                        LinkArchive.original_url,
+                        LinkArchive.created_at,
+                        LinkArchive.redirect_count,
+                        LinkArchive.last_used_at
                     )
                 )
-            ).scalar_one_or_none()
-        return link
+            ).one_or_none()
+        return stats
+
+    async def resolve_redirect(self, short_code: str) -> Row | None:
+        # Lookup, expiry check and click count in a single atomic statement
+        return (
+            await self.db_session.execute(
+                update(
+                    Link
+                ).where(
+                    Link.short_code == short_code,
+                    or_(Link.expires_at.is_(None), Link.expires_at > func.now())
+                ).values(
+                    redirect_count=Link.redirect_count + 1,
+                    last_used_at=func.greatest(Link.last_used_at, func.now())
+                ).returning(
+                    Link.original_url,
+                    Link.expires_at
+                )
+            )
+        ).one_or_none()
 
-    async def get_links_by_original_url(self, original_url: str) -> list[Link]:
-        async with self.db_session as session:
-            links: list[Link] = list((
-                await session.execute(
+    async def get_links_by_original_url(
+        self,
+        original_url: str,
+        limit: int,
+        before_id: int | None = None
+    ) -> Sequence[Row]:
+        return (
+            await self.db_session.execute(
+                self._paginate(
                     select(
-                        Link
+                        Link.__table__,
+                        false().label('is_expired')
                     ).where(
-                        Link.original_url == original_url,
-                        Link.is_expired == False
-                    )
+                        Link.original_url == original_url
+                    ),
+                    limit,
+                    before_id
                 )
-            ).scalars().all())
-        return links
+            )
+        ).all()
 
-    async def get_expired_links(self) -> list[Link]:
-        async with self.db_session as session:
-            links: list[Link] = list((
-                await session.execute(
+    async def get_expired_links(
+        self,
+        limit: int,
+        before_id: int | None = None
+    ) -> Sequence[Row]:
+        return (
+            await self.db_session.execute(
+                self._paginate(
                     select(
-                        Link
+                        LinkArchive.__table__,
+                        true().label('is_expired')
+                    ),
+                    limit,
+                    before_id,
+                    LinkArchive
+                )
+            )
+        ).all()
+
+    async def get_short_codes(self, batch_size: int) -> AsyncIterator[Sequence[str]]:
+        last_id = 0
+        while True:
+            rows = (
+                await self.db_session.execute(
+                    select(
+                        Link.id,
+                        Link.short_code
                     ).where(
-                        Link.is_expired == True
+                        Link.id > last_id
+                    ).order_by(
+                        Link.id
+                    ).limit(
+                        batch_size
                     )
                 )
-            ).scalars().all())
-        return links
+            ).all()
+            if rows:
+                last_id = rows[-1].id
+                yield [row.short_code for row in rows]
+            if len(rows) < batch_size:
+                break
 
     async def create_link(
         self,
@@ -92,94 +208,270 @@ class LinksRepository:
         short_link: str,
         expires_at: dt.datetime | None,
         user_id: int | None
-    ) -> int:
-        db_link = Link(
-            original_url=link.original_url.unicode_string(),
-            short_code=short_code,
-            short_link=short_link,
-            expires_at=expires_at,
-            user_id=user_id,
-        )
-        async with self.db_session as session:
-            session.add(db_link)
-            await session.commit()
-            await session.flush()
-            return db_link.id
+    ) -> Link | None:
+        created_link: Link | None = (
+            await self.db_session.execute(
+                insert(
+                    Link
+                ).values(
+                    original_url=link.original_url.unicode_string(),
+                    short_code=short_code,
+                    short_link=short_link,
+                    expires_at=expires_at,
+                    user_id=user_id,
+                ).on_conflict_do_nothing(
+                    index_elements=[Link.short_code]
+                ).returning(Link)
+            )
+        ).scalar_one_or_none()
+        return created_link
+
+    async def create_links(
+        self,
+        links: list[tuple[str, str, str]],
+        expires_at: dt.datetime | None,
+        user_id: int | None,
+        batch_size: int
+    ) -> list[Link]:
+        created_links: list[Link] = []
+        for start in range(0, len(links), batch_size):
+            created_links.extend((
+                await self.db_session.execute(
+                    insert(
+                        Link
+                    ).values([
+                        {
+                            'original_url': original_url,
+                            'short_code': short_code,
+                            'short_link': short_link,
+                            'expires_at': expires_at,
+                            'user_id': user_id,
+                        }
+                        for original_url, short_code, short_link in links[start:start + batch_size]
+                    ]).on_conflict_do_nothing(
+                        index_elements=[Link.short_code]
+                    ).returning(Link)
+                )
+            ).scalars().all())
+        return created_links
 
     async def delete_link(self, short_code: str) -> None:
-        async with self.db_session as session:
-            await session.execute(
-                delete(
+        await self.db_session.execute(
+            delete(
+                Link
+            ).where(
+                Link.short_code == short_code
+            )
+        )
+
+    async def apply_link_clicks(
+        self,
+        clicks: list[tuple[str, int, dt.datetime]],
+        batch_size: int
+    ) -> None:
+        for start in range(0, len(clicks), batch_size):
+            pending = values(
+                column('short_code', String),
+                column('clicks', Integer),
+                column('last_used_at', DateTime(timezone=True)),
+                name='pending'
+            ).data(clicks[start:start + batch_size])
+            await self.db_session.execute(
+                update(
                     Link
                 ).where(
-                    Link.short_code == short_code
+                    Link.short_code == pending.c.short_code
+                ).values(
+                    redirect_count=Link.redirect_count + pending.c.clicks,
+                    last_used_at=func.greatest(Link.last_used_at, pending.c.last_used_at)
+                )
+            )
+
+    @staticmethod
+    def _rollup_clicks(model: type[LinkClickHourly | LinkClickDaily], unit: str, clicks):
+        query = insert(
+            model
+        ).from_select(
+            ['link_id', 'bucket', 'clicks'],
+            select(
+                clicks.c.link_id,
+                func.date_trunc(unit, clicks.c.clicked_at, 'UTC').label('bucket'),
+                func.count()
+            ).group_by(
+                clicks.c.link_id,
+                'bucket'
+            )
+        )
+        return query.on_conflict_do_update(
+            index_elements=[model.link_id, model.bucket],
+            set_={'clicks': model.clicks + query.excluded.clicks}
+        )
+
+    async def apply_link_click_events(
+        self,
+        events: list[tuple[str, dt.datetime]],
+        batch_size: int
+    ) -> None:
+        # The raw log and both rollups are written by a single statement
+        for start in range(0, len(events), batch_size):
+            pending = values(
+                column('short_code', String),
+                column('clicked_at', DateTime(timezone=True)),
+                name='pending'
+            ).data(events[start:start + batch_size])
+            inserted = insert(
+                LinkClick
+            ).from_select(
+                ['link_id', 'clicked_at'],
+                select(
+                    Link.id,
+                    pending.c.clicked_at
+                ).join(
+                    Link,
+                    Link.short_code == pending.c.short_code
+                )
+            ).returning(
+                LinkClick.link_id,
+                LinkClick.clicked_at
+            ).cte('inserted')
+            await self.db_session.execute(
+                self._rollup_clicks(
+                    LinkClickDaily, 'day', inserted
+                ).add_cte(
+                    self._rollup_clicks(LinkClickHourly, 'hour', inserted).cte('hourly')
+                )
+            )
+
+    async def get_link_clicks(
+        self,
+        short_code: str,
+        model: type[LinkClickHourly | LinkClickDaily],
+        since: dt.datetime
+    ) -> Sequence[Row]:
+        return (
+            await self.read_session.execute(
+                select(
+                    model.bucket,
+                    model.clicks
+                ).where(
+                    # Rollups of an archived link are kept under its id
+                    model.link_id == func.coalesce(
+                        select(Link.id).where(Link.short_code == short_code).scalar_subquery(),
+                        self._archived_link(short_code, LinkArchive.id).scalar_subquery()
+                    ),
+                    model.bucket >= since
+                ).order_by(
+                    model.bucket
+                )
+            )
+        ).all()
+
+    async def delete_link_clicks_before(
+        self,
+        model: type[LinkClick | LinkClickHourly | LinkClickDaily],
+        cutoff: dt.datetime,
+        batch_size: int
+    ) -> int:
+        primary_key = model.__table__.primary_key.columns
+        time_column = model.clicked_at if model is LinkClick else model.bucket
+        result = await self.db_session.execute(
+            delete(
+                model
+            ).where(
+                tuple_(*primary_key).in_(
+                    select(
+                        *primary_key
+                    ).where(
+                        time_column < cutoff
+                    ).limit(
+                        batch_size
+                    )
                 )
             )
-            await session.commit()
-            await session.flush()
+        )
+        return result.rowcount
 
-    async def update_link_stats(self, link_id: int, stats: LinkUpdateStatsSchema) -> None:
-        async with self.db_session as session:
-            await session.execute(
+    async def update_link_original_url(self, link_id: int, original_url: str) -> Link | None:
+        updated_link: Link | None = (
+            await self.db_session.execute(
                 update(
                     Link
                 ).where(
                     Link.id == link_id
                 ).values(
-                    redirect_count=stats.redirect_count,
-                    last_used_at=stats.last_used_at
-                )
+                    original_url=original_url
+                ).returning(Link)
             )
-            await session.commit()
-            await session.flush()
+        ).scalar_one_or_none()
+        return updated_link
 
-    async def update_link_original_url(self, link_id: int, original_url: str) -> int:
-        async with self.db_session as session:
-            link_id: int = (
-                await session.execute(
-                    update(
-                        Link
-                    ).where(
-                        Link.id == link_id
-                    ).values(
-                        original_url=original_url
-                    ).returning(Link.id)
-                )
-            ).scalar_one_or_none()
-            await session.commit()
-            await session.flush()
-            return link_id
-
-    async def set_expired_links(self):
-        async with self.db_session as session:
-            expired_links: list[Link] = list((
-                await session.execute(
-                    update(
-                        Link
-                    ).where(
-                        Link.expires_at < dt.datetime.now(dt.UTC)
-                    ).values(
-                        is_expired=True
-                    ).returning(Link)
+    async def archive_expired_links(self, batch_size: int) -> Sequence[Row]:
+        columns = [link_column.name for link_column in Link.__table__.c]
+        # Deleting a link drops its click log by cascade, the rollups stay
+        # with the archived link
+        moved = delete(
+            Link
+        ).where(
+            Link.id.in_(
+                select(
+                    Link.id
+                ).where(
+                    Link.expires_at < dt.datetime.now(dt.UTC)
+                ).order_by(
+                    Link.expires_at
+                ).limit(
+                    batch_size
+                ).with_for_update(skip_locked=True)
+            )
+        ).returning(
+            *Link.__table__.c
+        ).cte('moved')
+        return (
+            await self.db_session.execute(
+                insert(
+                    LinkArchive
+                ).add_cte(
+                    moved
+                ).from_select(
+                    columns,
+                    select(*(moved.c[name] for name in columns))
+                ).returning(
+                    LinkArchive.short_code,
+                    LinkArchive.original_url,
+                    LinkArchive.user_id
                 )
-            ).scalars().all())
-            await session.commit()
-            await session.flush()
-            return expired_links
-
-    async def delete_unused_links(self, days: int) -> list[Link]:
-        time_to_delete = dt.datetime.now(dt.UTC) - dt.timedelta(days=days)
-        async with self.db_session as session:
-            deleted_links: list[Link] = list((
-                await session.execute(
-                    delete(
-                        Link
-                    ).where(
-                        ((Link.last_used_at.isnot(None)) & (Link.last_used_at < time_to_delete))
-                        | ((Link.last_used_at.is_(None)) & (Link.created_at < time_to_delete))
-                    ).returning(Link)
+            )
+        ).all()
+
+    async def delete_unused_links(
+        self,
+        model: type[Link | LinkArchive],
+        cutoff: dt.datetime,
+        after_id: int,
+        batch_size: int
+    ) -> Sequence[Row]:
+        return (
+            await self.db_session.execute(
+                delete(
+                    model
+                ).where(
+                    model.id.in_(
+                        select(
+                            model.id
+                        ).where(
+                            model.id > after_id,
+                            func.coalesce(model.last_used_at, model.created_at) < cutoff
+                        ).order_by(
+                            model.id
+                        ).limit(
+                            batch_size
+                        ).with_for_update(skip_locked=True)
+                    )
+                ).returning(
+                    model.id,
+                    model.short_code,
+                    model.original_url,
+                    model.user_id
                 )
-            ).scalars().all())
-            await session.commit()
-            await session.flush()
-            return deleted_links
+            )
+        ).all()
@@ -0,0 +1,295 @@
+import asyncio
+import datetime as dt
+import hashlib
+import heapq
+import time
+from collections import Counter, defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from itertools import islice
+from typing import TypeVar
+
+from sqlalchemy import BigInteger, ColumnElement, Row, String, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Link, LinkArchive, LinkClick, LinkClickHourly, LinkClickDaily, LinkShardBucket
+from repository.links import LinksRepository
+from schemas import LinkCreateSchema
+
+LINK_BUCKETS = 1024
+
+T = TypeVar('T')
+
+
+def link_bucket(short_code: str) -> int:
+    # md5 rather than hash(): the bucket must not change between processes
+    return int.from_bytes(hashlib.md5(short_code.encode()).digest()[:4], 'big') % LINK_BUCKETS
+
+
+def link_bucket_sql(short_code: ColumnElement[str]) -> ColumnElement[int]:
+    # link_bucket() computed by Postgres
+    return func.mod(
+        cast(
+            cast(literal('x', String).concat(func.substr(func.md5(short_code), 1, 8)), BIT(32)),
+            BigInteger
+        ),
+        LINK_BUCKETS
+    )
+
+
+class LinkBucketMap:
+    """Shard of every link bucket.
+
+    Links are spread over LINK_BUCKETS buckets by a hash of short_code, and
+    buckets over shards by the link_shard_buckets table on the primary. Adding
+    a shard moves whole buckets and never rehashes codes.
+    """
+
+    def __init__(self, shard_count: int, refresh_interval: float = 0.0):
+        self.shard_count = shard_count
+        self.refresh_interval = refresh_interval
+        self._shards = [0] * LINK_BUCKETS
+        self._loaded_at: float | None = None
+
+    def shard_of(self, short_code: str) -> int:
+        return self._shards[link_bucket(short_code)]
+
+    def shard_of_bucket(self, bucket: int) -> int:
+        return self._shards[bucket]
+
+    async def refresh(self, db_session: AsyncSession) -> None:
+        # With a single shard there is nothing to look up
+        if self.shard_count == 1:
+            return
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        shards = [0] * LINK_BUCKETS
+        for bucket, shard in (
+            await db_session.execute(select(LinkShardBucket.bucket, LinkShardBucket.shard))
+        ).all():
+            if shard >= self.shard_count:
+                raise RuntimeError(
+                    f'Bucket {bucket} is on shard {shard}, '
+                    f'but only {self.shard_count} shards are configured'
+                )
+            shards[bucket] = shard
+        self._shards = shards
+        self._loaded_at = time.monotonic()
+
+
+class ShardedLinksRepository:
+    """LinksRepository over several databases.
+
+    Calls for one short code go to its shard; lists are read from all shards
+    concurrently and merged, with one cursor position per shard.
+    """
+
+    def __init__(self, shards: Sequence[LinksRepository], bucket_map: LinkBucketMap):
+        if len(shards) != bucket_map.shard_count:
+            raise ValueError(f'Expected {bucket_map.shard_count} shards, got {len(shards)}')
+        self.shards = list(shards)
+        self.bucket_map = bucket_map
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shards)
+
+    def shard_for(self, short_code: str) -> LinksRepository:
+        return self.shards[self.bucket_map.shard_of(short_code)]
+
+    def _group_by_shard(self, items: Sequence[T], short_code: Callable[[T], str]) -> dict[int, list[T]]:
+        groups: dict[int, list[T]] = defaultdict(list)
+        for item in items:
+            groups[self.bucket_map.shard_of(short_code(item))].append(item)
+        return groups
+
+    async def commit(self) -> None:
+        # Shards commit independently: a failure can leave earlier shards committed
+        await asyncio.gather(*(shard.commit() for shard in self.shards))
+
+    async def _scatter_page(
+        self,
+        fetch: Callable[[LinksRepository, int | None], Awaitable[Sequence[Row]]],
+        limit: int,
+        before_ids: Sequence[int | None] | None,
+        owned_only: bool = True
+    ) -> tuple[list[Row], list[int | None] | None]:
+        before_ids = list(before_ids or [])[:self.shard_count]
+        before_ids += [None] * (self.shard_count - len(before_ids))
+
+        async def fetch_page(shard: LinksRepository, before_id: int | None) -> Sequence[Row]:
+            # 0 marks a shard that has no more rows
+            return [] if before_id == 0 else await fetch(shard, before_id)
+
+        pages = await asyncio.gather(*(
+            fetch_page(shard, before_id) for shard, before_id in zip(self.shards, before_ids)
+        ))
+        # While buckets are moved a link exists on two shards: only the one
+        # the map points at is listed
+        candidates = [
+            [
+                (link, shard, index) for index, link in enumerate(page)
+                if not owned_only
+                or self.shard_count == 1
+                or self.bucket_map.shard_of(link.short_code) == shard
+            ]
+            for shard, page in enumerate(pages)
+        ]
+        merged = list(islice(
+            heapq.merge(*candidates, key=lambda item: item[0].created_at, reverse=True),
+            limit
+        ))
+        # Every shard page is consumed from the start, so its cursor is the last row taken
+        taken = Counter(shard for _, shard, _ in merged)
+        last_taken = {shard: index for _, shard, index in merged}
+        next_before_ids: list[int | None] = []
+        for shard, page in enumerate(pages):
+            if taken[shard] < len(candidates[shard]):
+                next_before_ids.append(
+                    page[last_taken[shard]].id if shard in last_taken else before_ids[shard]
+                )
+            elif len(page) > limit:
+                # The rest of the page was skipped as owned by another shard
+                next_before_ids.append(page[-1].id)
+            else:
+                next_before_ids.append(0)
+        has_more = any(before_id != 0 for before_id in next_before_ids)
+        return [link for link, _, _ in merged], next_before_ids if has_more else None
+
+    async def get_user_links(
+        self,
+        user_id: int,
+        limit: int,
+        before_ids: Sequence[int | None] | None = None
+    ) -> tuple[list[Row], list[int | None] | None]:
+        return await self._scatter_page(
+            lambda shard, before_id: shard.get_user_links(user_id, limit, before_id),
+            limit,
+            before_ids
+        )
+
+    async def get_links_by_original_url(
+        self,
+        original_url: str,
+        limit: int,
+        before_ids: Sequence[int | None] | None = None
+    ) -> tuple[list[Row], list[int | None] | None]:
+        return await self._scatter_page(
+            lambda shard, before_id: shard.get_links_by_original_url(original_url, limit, before_id),
+            limit,
+            before_ids
+        )
+
+    async def get_expired_links(
+        self,
+        limit: int,
+        before_ids: Sequence[int | None] | None = None
+    ) -> tuple[list[Row], list[int | None] | None]:
+        return await self._scatter_page(
+            lambda shard, before_id: shard.get_expired_links(limit, before_id),
+            limit,
+            before_ids,
+            # Archived links are not moved and stay on the shard that archived them
+            owned_only=False
+        )
+
+    async def get_link(self, short_code: str) -> Link | None:
+        return await self.shard_for(short_code).get_link(short_code)
+
+    async def get_link_stats(self, short_code: str) -> Row | None:
+        return await self.shard_for(short_code).get_link_stats(short_code)
+
+    async def resolve_redirect(self, short_code: str) -> Row | None:
+        return await self.shard_for(short_code).resolve_redirect(short_code)
+
+    async def get_short_codes(self, batch_size: int) -> AsyncIterator[Sequence[str]]:
+        for shard in self.shards:
+            async for short_codes in shard.get_short_codes(batch_size):
+                yield short_codes
+
+    async def create_link(
+        self,
+        link: LinkCreateSchema,
+        short_code: str,
+        short_link: str,
+        expires_at: dt.datetime | None,
+        user_id: int | None
+    ) -> Link | None:
+        return await self.shard_for(short_code).create_link(
+            link, short_code, short_link, expires_at, user_id
+        )
+
+    async def create_links(
+        self,
+        links: list[tuple[str, str, str]],
+        expires_at: dt.datetime | None,
+        user_id: int | None,
+        batch_size: int
+    ) -> list[Link]:
+        created_links = await asyncio.gather(*(
+            self.shards[shard].create_links(shard_links, expires_at, user_id, batch_size)
+            for shard, shard_links in self._group_by_shard(links, lambda link: link[1]).items()
+        ))
+        return [link for shard_links in created_links for link in shard_links]
+
+    async def delete_link(self, short_code: str) -> None:
+        await self.shard_for(short_code).delete_link(short_code)
+
+    async def apply_link_clicks(
+        self,
+        clicks: list[tuple[str, int, dt.datetime]],
+        batch_size: int
+    ) -> None:
+        await asyncio.gather(*(
+            self.shards[shard].apply_link_clicks(shard_clicks, batch_size)
+            for shard, shard_clicks in self._group_by_shard(clicks, lambda click: click[0]).items()
+        ))
+
+    async def apply_link_click_events(
+        self,
+        events: list[tuple[str, dt.datetime]],
+        batch_size: int
+    ) -> None:
+        await asyncio.gather(*(
+            self.shards[shard].apply_link_click_events(shard_events, batch_size)
+            for shard, shard_events in self._group_by_shard(events, lambda event: event[0]).items()
+        ))
+
+    async def get_link_clicks(
+        self,
+        short_code: str,
+        model: type[LinkClickHourly | LinkClickDaily],
+        since: dt.datetime
+    ) -> Sequence[Row]:
+        return await self.shard_for(short_code).get_link_clicks(short_code, model, since)
+
+    async def delete_link_clicks_before(
+        self,
+        shard: int,
+        model: type[LinkClick | LinkClickHourly | LinkClickDaily],
+        cutoff: dt.datetime,
+        batch_size: int
+    ) -> int:
+        return await self.shards[shard].delete_link_clicks_before(model, cutoff, batch_size)
+
+    async def update_link_original_url(
+        self,
+        short_code: str,
+        link_id: int,
+        original_url: str
+    ) -> Link | None:
+        # Ids are only unique within a shard
+        return await self.shard_for(short_code).update_link_original_url(link_id, original_url)
+
+    async def archive_expired_links(self, shard: int, batch_size: int) -> Sequence[Row]:
+        return await self.shards[shard].archive_expired_links(batch_size)
+
+    async def delete_unused_links(
+        self,
+        shard: int,
+        model: type[Link | LinkArchive],
+        cutoff: dt.datetime,
+        after_id: int,
+        batch_size: int
+    ) -> Sequence[Row]:
+        return await self.shards[shard].delete_unused_links(model, cutoff, after_id, batch_size)
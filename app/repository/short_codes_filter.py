@@ -0,0 +1,160 @@
+import hashlib
+import math
+from collections.abc import Iterable
+
+from fastapi_cache import FastAPICache
+
+# Sets the bits in the live filter (only once it has been built) and in the
+# filter being rebuilt, and drops negative cache entries of the added codes
+ADD_SCRIPT = """
+local live = redis.call('EXISTS', KEYS[1]) == 1
+local rebuilding = redis.call('EXISTS', KEYS[3]) == 1
+for i = 1, #ARGV do
+    if live then
+        redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+    end
+    if rebuilding then
+        redis.call('SETBIT', KEYS[2], ARGV[i], 1)
+    end
+end
+if #KEYS > 3 then
+    redis.call('DEL', unpack(KEYS, 4))
+end
+return 0
+"""
+
+# Publishes the rebuilt filter unless the rebuild outlived its lock, in which
+# case codes added after the lock expired could be missing from it
+FINISH_REBUILD_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    redis.call('DEL', KEYS[2])
+    return 0
+end
+redis.call('RENAME', KEYS[2], KEYS[1])
+redis.call('DEL', KEYS[3])
+return 1
+"""
+
+
+class ShortCodesFilterStats:
+    def __init__(self):
+        self.checks = 0
+        self.rejected = 0
+        self.negative_cache_hits = 0
+        self.passed = 0
+        self.false_positives = 0
+
+    @property
+    def false_positive_rate(self) -> float:
+        return self.false_positives / self.passed if self.passed else 0.0
+
+
+short_codes_filter_stats = ShortCodesFilterStats()
+
+
+class ShortCodesFilter:
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        negative_ttl: int,
+        rebuild_timeout: int
+    ):
+        self._redis = FastAPICache.get_backend().redis
+        self.prefix = FastAPICache.get_prefix()
+        self.negative_ttl = negative_ttl
+        self.rebuild_timeout = rebuild_timeout
+        # Optimal Bloom filter parameters for the expected number of codes
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._filter_key = f'{self.prefix}:short_codes:filter'
+        self._rebuild_key = f'{self.prefix}:short_codes:filter:rebuild'
+        self._rebuilding_key = f'{self.prefix}:short_codes:filter:rebuilding'
+
+    def _missing_key(self, short_code: str) -> str:
+        return f'{self.prefix}:short_codes:missing:{short_code}'
+
+    def _offsets(self, short_code: str) -> list[int]:
+        digest = hashlib.blake2b(short_code.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8]), int.from_bytes(digest[8:]) | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    async def might_exist(self, short_code: str) -> bool:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self._filter_key)
+            pipe.exists(self._missing_key(short_code))
+            for offset in self._offsets(short_code):
+                pipe.getbit(self._filter_key, offset)
+            built, missing, *bits = await pipe.execute()
+
+        short_codes_filter_stats.checks += 1
+        if built and not all(bits):
+            short_codes_filter_stats.rejected += 1
+            return False
+        if missing:
+            short_codes_filter_stats.negative_cache_hits += 1
+            return False
+        if built:
+            short_codes_filter_stats.passed += 1
+        return True
+
+    async def mark_missing(self, short_code: str):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self._filter_key)
+            pipe.set(self._missing_key(short_code), 1, ex=self.negative_ttl)
+            built, _ = await pipe.execute()
+        # Expired links that are still in the filter are counted here as well
+        if built:
+            short_codes_filter_stats.false_positives += 1
+
+    async def forget(self, short_code: str):
+        # Deleted codes stay in the filter until the next rebuild
+        await self._redis.set(self._missing_key(short_code), 1, ex=self.negative_ttl)
+
+    async def add(self, short_codes: Iterable[str], batch_size: int = 1000):
+        short_codes = list(short_codes)
+        for start in range(0, len(short_codes), batch_size):
+            batch = short_codes[start:start + batch_size]
+            await self._redis.eval(
+                ADD_SCRIPT,
+                3 + len(batch),
+                self._filter_key,
+                self._rebuild_key,
+                self._rebuilding_key,
+                *map(self._missing_key, batch),
+                *(offset for short_code in batch for offset in self._offsets(short_code))
+            )
+
+    async def start_rebuild(self) -> bool:
+        if not await self._redis.set(self._rebuilding_key, 1, ex=self.rebuild_timeout, nx=True):
+            return False
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(self._rebuild_key)
+            # Allocates the whole bitmap, so an empty table still gives a built filter
+            pipe.setbit(self._rebuild_key, self.size - 1, 0)
+            await pipe.execute()
+        return True
+
+    async def add_to_rebuild(self, short_codes: Iterable[str]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for short_code in short_codes:
+                for offset in self._offsets(short_code):
+                    pipe.setbit(self._rebuild_key, offset, 1)
+            await pipe.execute()
+
+    async def finish_rebuild(self) -> bool:
+        return bool(await self._redis.eval(
+            FINISH_REBUILD_SCRIPT,
+            3,
+            self._filter_key,
+            self._rebuild_key,
+            self._rebuilding_key
+        ))
+
+    async def get_usage(self) -> tuple[int, float]:
+        # Memory in bytes and the false positive rate implied by the fill ratio
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.strlen(self._filter_key)
+            pipe.bitcount(self._filter_key)
+            memory, bits_set = await pipe.execute()
+        return memory, (bits_set / self.size) ** self.hashes
@@ -0,0 +1,32 @@
+import datetime as dt
+
+from fastapi_cache import FastAPICache
+
+
+class SweepProgress:
+    """Where an interrupted batched sweep stopped: its cutoff and last processed id."""
+
+    def __init__(self):
+        self._redis = FastAPICache.get_backend().redis
+        self.prefix = FastAPICache.get_prefix()
+
+    def _key(self, sweep: str) -> str:
+        return f'{self.prefix}:sweeps:{sweep}'
+
+    async def get(self, sweep: str) -> tuple[dt.datetime, int] | None:
+        progress = await self._redis.hgetall(self._key(sweep))
+        if not progress:
+            return None
+        return (
+            dt.datetime.fromtimestamp(float(progress[b'cutoff']), dt.UTC),
+            int(progress[b'last_id'])
+        )
+
+    async def save(self, sweep: str, cutoff: dt.datetime, last_id: int):
+        await self._redis.hset(
+            self._key(sweep),
+            mapping={'cutoff': cutoff.timestamp(), 'last_id': last_id}
+        )
+
+    async def clear(self, sweep: str):
+        await self._redis.delete(self._key(sweep))
@@ -6,25 +6,35 @@ from schemas import UserCreateSchema
 
 
 class UsersRepository:
-    def __init__(self, db_session: AsyncSession) -> None:
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        read_session: AsyncSession | None = None
+    ) -> None:
         self.db_session = db_session
+        self.read_session = read_session or db_session
+
+    async def commit(self) -> None:
+        await self.db_session.commit()
 
     async def create_user(self, user: UserCreateSchema) -> User:
-        query = insert(User).values(**user.model_dump()).returning(User.id)
-        async with self.db_session as session:
-            user_id: int = (await session.execute(query)).scalar()
-            await session.commit()
-            await session.flush()
-        return await self.get_user(user_id)
+        return (await self.db_session.execute(
+            insert(User).values(**user.model_dump()).returning(User)
+        )).scalar_one()
 
     async def get_user(self, user_id: int) -> User | None:
-        async with self.db_session as session:
-            return (await session.execute(
-                select(User).where(User.id == user_id)
-            )).scalar_one_or_none()
+        return await self._get_user_where(User.id == user_id)
 
     async def get_user_by_username(self, username: str) -> User | None:
-        async with self.db_session as session:
-            return (await session.execute(
-                select(User).where(User.username == username)
+        return await self._get_user_where(User.username == username)
+
+    async def _get_user_where(self, condition) -> User | None:
+        user = (await self.read_session.execute(
+            select(User).where(condition)
+        )).scalar_one_or_none()
+        if user is None and self.read_session is not self.db_session:
+            # A user registered moments ago may not have reached the replica yet
+            user = (await self.db_session.execute(
+                select(User).where(condition)
             )).scalar_one_or_none()
+        return user
@@ -1,10 +1,16 @@
 from schemas.links import (
     LinkSchema,
     LinkCreateSchema,
+    LinkBatchItemSchema,
     CreateLinkParams,
-    LinkUpdateStatsSchema,
     LinkStatsSchema,
-    LinkUpdateSchema
+    LinkStatsParams,
+    LinkClicksBucketSchema,
+    LinkUpdateSchema,
+    LinkPageSchema,
+    LinksPageParams,
+    LinksSearchParams,
+    encode_cursor
 )
 from schemas.users import UserLoginSchema, UserCreateSchema
 
@@ -13,8 +19,14 @@ __all__ = [
     'UserCreateSchema',
     'LinkSchema',
     'LinkCreateSchema',
+    'LinkBatchItemSchema',
     'CreateLinkParams',
-    'LinkUpdateStatsSchema',
     'LinkStatsSchema',
-    'LinkUpdateSchema'
+    'LinkStatsParams',
+    'LinkClicksBucketSchema',
+    'LinkUpdateSchema',
+    'LinkPageSchema',
+    'LinksPageParams',
+    'LinksSearchParams',
+    'encode_cursor'
 ]
@@ -1,8 +1,13 @@
+import base64
+import binascii
 import datetime as dt
+from collections.abc import Sequence
+from typing import Literal
 
 from pydantic import (
     BaseModel,
     AnyHttpUrl,
+    Field,
     HttpUrl,
     field_validator
 )
@@ -24,6 +29,55 @@ class LinkSchema(BaseModel):
         from_attributes = True
 
 
+class LinkPageSchema(BaseModel):
+    items: list[LinkSchema]
+    next_cursor: str | None = None
+
+
+class LinksPageParams(BaseModel):
+    limit: int = Field(default=50, ge=1, le=500)
+    cursor: str | None = None
+
+    @field_validator("cursor")
+    @classmethod
+    def validate_cursor(cls, value: str | None) -> str | None:
+        if value is not None:
+            decode_cursor(value)
+        return value
+
+    @property
+    def before_ids(self) -> list[int | None] | None:
+        return decode_cursor(self.cursor) if self.cursor else None
+
+
+class LinksSearchParams(LinksPageParams):
+    original_url: AnyHttpUrl
+
+
+def encode_cursor(before_ids: Sequence[int | None]) -> str:
+    # One position per shard: the last id returned, empty if the shard was not
+    # read yet, 0 once it is exhausted; a single shard gives the plain id
+    raw = ','.join('' if link_id is None else str(link_id) for link_id in before_ids)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list[int | None]:
+    try:
+        raw = base64.b64decode(
+            cursor + '=' * (-len(cursor) % 4),
+            altchars=b'-_',
+            validate=True
+        ).decode()
+        before_ids = [int(link_id) if link_id else None for link_id in raw.split(',')]
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    # Only cursors issued by encode_cursor are accepted: every one has a
+    # position for at least one shard
+    if encode_cursor(before_ids) != cursor or all(before_id is None for before_id in before_ids):
+        raise ValueError('Invalid cursor')
+    return before_ids
+
+
 class LinkUpdateSchema(BaseModel):
     original_url: AnyHttpUrl
 
@@ -32,6 +86,11 @@ class LinkCreateSchema(LinkUpdateSchema):
     custom_alias: str | None = None
 
 
+class LinkBatchItemSchema(BaseModel):
+    link: LinkSchema | None = None
+    error: str | None = None
+
+
 class CreateLinkParams(BaseModel):
     expires_at: dt.datetime | None = None
 
@@ -60,9 +119,12 @@ class CreateLinkParams(BaseModel):
         return value
 
 
-class LinkUpdateStatsSchema(BaseModel):
-    redirect_count: int
-    last_used_at: dt.datetime
+class LinkClicksBucketSchema(BaseModel):
+    bucket: dt.datetime
+    clicks: int
+
+    class Config:
+        from_attributes = True
 
 
 class LinkStatsSchema(BaseModel):
@@ -70,6 +132,12 @@ class LinkStatsSchema(BaseModel):
     created_at: dt.datetime
     redirect_count: int
     last_used_at: dt.datetime | None
+    clicks: list[LinkClicksBucketSchema] | None = None
 
     class Config:
         from_attributes = True
+
+
+class LinkStatsParams(BaseModel):
+    granularity: Literal['hour', 'day'] | None = None
+    since: dt.datetime | None = None
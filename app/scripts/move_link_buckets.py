@@ -0,0 +1,313 @@
+"""Move link buckets to another shard.
+
+Adding a shard: create its database, migrate it with
+`alembic -x db_url=<shard url> upgrade head`, add the URL to
+LINK_SHARD_DB_URLS of every API and Celery process, then move part of the
+buckets onto the new shard.
+
+The links of the buckets are copied with their click log and rollups (the
+target assigns new ids), link_shard_buckets is pointed at the target along
+with the source and the last copied id, and once every process has reloaded
+the map the links created on the source in the meantime are copied too and
+the originals are deleted. A run that fails after the switch is finished by
+running the script again with the same buckets.
+
+While a bucket is moved, changes made on the source between the copy and
+the switch are lost: clicks, new URLs of updated links, and deletions (the
+deleted link comes back from the copy). Archived links stay on the shard
+that archived them, and a link that expires during the move can be listed
+twice in /links/expired. Move buckets when the traffic is low.
+Run from app/: python -m scripts.move_link_buckets --buckets 512-1023 --to 1
+"""
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+
+from sqlalchemy import Row, delete, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import AsyncSessionFactory, ShardSessionFactories
+from models import Link, LinkClick, LinkClickHourly, LinkClickDaily, LinkShardBucket
+from repository import LinkBucketMap
+from repository.shards import LINK_BUCKETS, link_bucket_sql
+from settings import settings
+
+LINK_COLUMNS = [column.name for column in Link.__table__.c if column.name != 'id']
+CLICK_MODELS = (LinkClick, LinkClickHourly, LinkClickDaily)
+
+
+def parse_buckets(values: list[str]) -> list[int]:
+    buckets: set[int] = set()
+    for value in values:
+        start, _, stop = value.partition('-')
+        buckets.update(range(int(start), int(stop or start) + 1))
+    if not buckets or min(buckets) < 0 or max(buckets) >= LINK_BUCKETS:
+        raise SystemExit(f'Buckets must be between 0 and {LINK_BUCKETS - 1}')
+    return sorted(buckets)
+
+
+async def copy_clicks(
+    source: AsyncSession,
+    target: AsyncSession,
+    link_ids: dict[int, int],
+    batch_size: int
+) -> None:
+    for model in CLICK_MODELS:
+        columns = [column for column in model.__table__.c if column.name != 'id']
+        rows = await source.stream(select(*columns).where(model.link_id.in_(link_ids)))
+        async for partition in rows.partitions(batch_size):
+            await target.execute(insert(model), [
+                {**row._mapping, 'link_id': link_ids[row.link_id]} for row in partition
+            ])
+
+
+async def find_taken_codes(target: AsyncSession, links: list[Row]) -> list[int]:
+    # A code already on the target is either this link copied by an earlier
+    # run or another link created there after the switch
+    copied = set((
+        await target.execute(
+            select(
+                Link.short_code
+            ).where(
+                tuple_(Link.short_code, Link.created_at).in_(
+                    [(link.short_code, link.created_at) for link in links]
+                )
+            )
+        )
+    ).scalars())
+    return [link.id for link in links if link.short_code not in copied]
+
+
+async def copy_links(
+    source: AsyncSession,
+    target: AsyncSession,
+    buckets: list[int],
+    after_id: int,
+    batch_size: int
+) -> tuple[int, int, list[int]]:
+    copied_count = 0
+    taken_ids: list[int] = []
+    while True:
+        links = (
+            await source.execute(
+                select(
+                    Link.__table__
+                ).where(
+                    link_bucket_sql(Link.short_code).in_(buckets),
+                    Link.id > after_id
+                ).order_by(
+                    Link.id
+                ).limit(
+                    batch_size
+                )
+            )
+        ).all()
+        if not links:
+            break
+        after_id = links[-1].id
+        new_ids = dict((
+            await target.execute(
+                insert(
+                    Link
+                ).values(
+                    [{name: link._mapping[name] for name in LINK_COLUMNS} for link in links]
+                ).on_conflict_do_nothing(
+                    index_elements=[Link.short_code]
+                ).returning(
+                    Link.short_code,
+                    Link.id
+                )
+            )
+        ).all())
+        link_ids = {link.id: new_ids[link.short_code] for link in links if link.short_code in new_ids}
+        if link_ids:
+            await copy_clicks(source, target, link_ids, batch_size)
+        conflicts = [link for link in links if link.short_code not in new_ids]
+        if conflicts:
+            taken_ids.extend(await find_taken_codes(target, conflicts))
+        await target.commit()
+        await source.commit()
+        copied_count += len(link_ids)
+        if len(links) < batch_size:
+            break
+    return copied_count, after_id, taken_ids
+
+
+async def delete_links(
+    source: AsyncSession,
+    buckets: list[int],
+    keep_ids: list[int],
+    batch_size: int
+) -> int:
+    deleted_count = 0
+    while True:
+        # Deleting a link drops its click log by cascade, the rollups were copied
+        link_ids = (
+            await source.execute(
+                delete(
+                    Link
+                ).where(
+                    Link.id.in_(
+                        select(
+                            Link.id
+                        ).where(
+                            link_bucket_sql(Link.short_code).in_(buckets),
+                            Link.id.not_in(keep_ids)
+                        ).limit(
+                            batch_size
+                        )
+                    )
+                ).returning(
+                    Link.id
+                )
+            )
+        ).scalars().all()
+        for model in (LinkClickHourly, LinkClickDaily):
+            await source.execute(delete(model).where(model.link_id.in_(link_ids)))
+        await source.commit()
+        deleted_count += len(link_ids)
+        if len(link_ids) < batch_size:
+            return deleted_count
+
+
+async def point_buckets(
+    primary: AsyncSession,
+    buckets: list[int],
+    shard: int,
+    moving_from: int,
+    moving_after_id: int
+) -> None:
+    query = insert(LinkShardBucket).values([
+        {
+            'bucket': bucket,
+            'shard': shard,
+            'moving_from': moving_from,
+            'moving_after_id': moving_after_id,
+        }
+        for bucket in buckets
+    ])
+    await primary.execute(
+        query.on_conflict_do_update(
+            index_elements=[LinkShardBucket.bucket],
+            set_={
+                'shard': query.excluded.shard,
+                'moving_from': query.excluded.moving_from,
+                'moving_after_id': query.excluded.moving_after_id,
+            }
+        )
+    )
+    await primary.commit()
+
+
+async def get_unfinished_moves(
+    primary: AsyncSession,
+    buckets: list[int],
+    shard: int
+) -> dict[tuple[int, int], list[int]]:
+    moves: dict[tuple[int, int], list[int]] = defaultdict(list)
+    for bucket, moving_from, moving_after_id in (
+        await primary.execute(
+            select(
+                LinkShardBucket.bucket,
+                LinkShardBucket.moving_from,
+                LinkShardBucket.moving_after_id
+            ).where(
+                LinkShardBucket.bucket.in_(buckets),
+                LinkShardBucket.shard == shard,
+                LinkShardBucket.moving_from.is_not(None)
+            )
+        )
+    ).all():
+        moves[moving_from, moving_after_id].append(bucket)
+    return moves
+
+
+async def finish_buckets(primary: AsyncSession, buckets: list[int]) -> None:
+    await primary.execute(
+        update(
+            LinkShardBucket
+        ).where(
+            LinkShardBucket.bucket.in_(buckets)
+        ).values(
+            moving_from=None,
+            moving_after_id=None
+        )
+    )
+    await primary.commit()
+
+
+async def move_buckets(args: argparse.Namespace) -> list[dict]:
+    session_factories = [AsyncSessionFactory, *ShardSessionFactories]
+    if not 0 <= args.to < len(session_factories):
+        raise SystemExit(f'Shard {args.to} is not in LINK_SHARD_DB_URLS')
+
+    buckets = parse_buckets(args.buckets)
+    bucket_map = LinkBucketMap(len(session_factories))
+    async with AsyncSessionFactory() as primary:
+        await bucket_map.refresh(primary)
+    sources: dict[int, list[int]] = defaultdict(list)
+    for bucket in buckets:
+        if bucket_map.shard_of_bucket(bucket) != args.to:
+            sources[bucket_map.shard_of_bucket(bucket)].append(bucket)
+
+    results: dict[int, dict] = {}
+    for source, source_buckets in sources.items():
+        async with session_factories[source]() as source_session, \
+                session_factories[args.to]() as target_session:
+            copied_count, last_id, taken_ids = await copy_links(
+                source_session, target_session, source_buckets, 0, args.batch_size
+            )
+        results[source] = {
+            'source': source,
+            'target': args.to,
+            'buckets': len(source_buckets),
+            'copied': copied_count,
+            'taken_on_target': taken_ids,
+        }
+        async with AsyncSessionFactory() as primary:
+            await point_buckets(primary, source_buckets, args.to, source, last_id)
+
+    # Includes moves of an earlier run that failed after the switch
+    async with AsyncSessionFactory() as primary:
+        moves = await get_unfinished_moves(primary, buckets, args.to)
+    if moves:
+        # Until every process reloads the map new links may still land on the source
+        await asyncio.sleep(args.wait_seconds)
+
+    for (source, last_id), source_buckets in moves.items():
+        result = results.setdefault(source, {
+            'source': source,
+            'target': args.to,
+            'buckets': 0,
+            'copied': 0,
+            'taken_on_target': [],
+        })
+        async with session_factories[source]() as source_session, \
+                session_factories[args.to]() as target_session:
+            copied_count, _, taken_ids = await copy_links(
+                source_session, target_session, source_buckets, last_id, args.batch_size
+            )
+            result['copied'] += copied_count
+            result['taken_on_target'] += taken_ids
+            # Links whose code was taken on the target stay on the source for review
+            result['deleted'] = result.get('deleted', 0) + await delete_links(
+                source_session, source_buckets, result['taken_on_target'], args.batch_size
+            )
+        async with AsyncSessionFactory() as primary:
+            await finish_buckets(primary, source_buckets)
+    return list(results.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buckets', nargs='+', required=True, help='e.g. 0-511 700')
+    parser.add_argument('--to', type=int, required=True)
+    parser.add_argument('--batch-size', type=int, default=settings.LINK_SHARD_MOVE_BATCH_SIZE)
+    parser.add_argument(
+        '--wait-seconds',
+        type=float,
+        default=2 * settings.LINK_SHARD_MAP_REFRESH_SECONDS
+    )
+    print(json.dumps(asyncio.run(move_buckets(parser.parse_args())), indent=2))
@@ -1,6 +1,22 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
 from fastapi import security
 from passlib.context import CryptContext
 
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
 reusable_oauth2 = security.HTTPBearer(auto_error=False)
 
 pwd_context = CryptContext(
@@ -8,3 +24,49 @@ pwd_context = CryptContext(
     deprecated="auto",
     bcrypt__rounds=12
 )
+
+
+def _lower_hashing_thread_priority():
+    # bcrypt releases the GIL, but its threads still compete with the event
+    # loop for the CPU; on Linux niceness can be set per thread
+    if sys.platform == 'linux' and settings.PASSWORD_HASHING_NICENESS:
+        thread_id = threading.get_native_id()
+        niceness = os.getpriority(os.PRIO_PROCESS, thread_id) + settings.PASSWORD_HASHING_NICENESS
+        os.setpriority(os.PRIO_PROCESS, thread_id, min(niceness, 19))
+
+
+password_hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS or max(1, (os.cpu_count() or 1) - 1),
+    thread_name_prefix='password-hashing',
+    initializer=_lower_hashing_thread_priority
+)
+
+
+class PasswordHashingQueueStats:
+    def __init__(self):
+        self.tasks = 0
+        self.queue_time_seconds_total = 0.0
+        self.queue_time_seconds_max = 0.0
+
+    def observe(self, queue_time: float):
+        self.tasks += 1
+        self.queue_time_seconds_total += queue_time
+        self.queue_time_seconds_max = max(self.queue_time_seconds_max, queue_time)
+        if queue_time > settings.PASSWORD_HASHING_QUEUE_WARNING_SECONDS:
+            logger.warning(f'Password hashing waited {queue_time:.3f}s in queue')
+
+
+password_hashing_queue_stats = PasswordHashingQueueStats()
+
+
+async def run_password_hashing(func: Callable[..., T], *args) -> T:
+    submitted_at = time.perf_counter()
+
+    def _run() -> T:
+        password_hashing_queue_stats.observe(time.perf_counter() - submitted_at)
+        return func(*args)
+
+    return await asyncio.get_running_loop().run_in_executor(
+        password_hashing_executor,
+        _run
+    )
@@ -9,27 +9,33 @@ from exceptions import (
     InvalidTokenException
 )
 from models import User
-from repository import UsersRepository
+from repository import UsersRepository, UsersCache
 from schemas import UserLoginSchema
-from security import pwd_context
+from security import pwd_context, run_password_hashing
 from settings import Settings
 
 
 class AuthService:
-    def __init__(self, user_repo: UsersRepository, settings: Settings):
+    def __init__(
+        self,
+        user_repo: UsersRepository,
+        users_cache: UsersCache,
+        settings: Settings
+    ):
         self.user_repo = user_repo
+        self.users_cache = users_cache
         self.settings = settings
 
     async def login(self, username: str, password: str) -> UserLoginSchema:
         user = await self.user_repo.get_user_by_username(username)
-        self._validate_auth_user(user, password)
+        await self._validate_auth_user(user, password)
         access_token = self.generate_access_token(user.id)
         return UserLoginSchema(id=user.id, access_token=access_token)
 
-    def _validate_auth_user(self, user: User, password: str):
+    async def _validate_auth_user(self, user: User, password: str):
         if not user:
             raise UserNotFound()
-        if not self.verify_password(password, user.password):
+        if not await self.verify_password(password, user.password):
             raise UserIncorrectPasswordException()
 
     def generate_access_token(self, user_id: int) -> str:
@@ -57,15 +63,23 @@ class AuthService:
             raise TokenExpiredException()
 
         user_id = payload['user_id']
+        if await self.users_cache.is_known_user(user_id):
+            return user_id
+
         if not await self.user_repo.get_user(user_id):
             raise UserNotFound()
 
+        await self.users_cache.add_user(user_id)
         return user_id
 
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        return await run_password_hashing(
+            pwd_context.verify,
+            plain_password,
+            hashed_password
+        )
 
     @staticmethod
-    def get_password_hash(password: str) -> str:
-        return pwd_context.hash(password)
+    async def get_password_hash(password: str) -> str:
+        return await run_password_hashing(pwd_context.hash, password)
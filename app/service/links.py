@@ -1,9 +1,13 @@
+import asyncio
 import datetime as dt
+import operator
 import random
 import string
+from collections.abc import Iterator, Sequence
 
 from fastapi import Request
 from pydantic import AnyHttpUrl
+from sqlalchemy import Row
 
 from exceptions import (
     LinkNotFound,
@@ -11,27 +15,51 @@ from exceptions import (
     ShortLinkGenerationException,
     UserIsNotLinkOwner
 )
-from models import Link
-from repository import LinksRepository, LinksCache
+from models import Link, LinkArchive, LinkClick, LinkClickHourly, LinkClickDaily
+from repository import (
+    ShardedLinksRepository,
+    LinksCache,
+    LinkClicksBuffer,
+    ShortCodesFilter,
+    SweepProgress
+)
 from schemas import (
     LinkSchema,
     LinkCreateSchema,
-    LinkUpdateStatsSchema,
-    LinkStatsSchema
+    LinkBatchItemSchema,
+    LinkStatsSchema,
+    LinkStatsParams,
+    LinkClicksBucketSchema,
+    LinksPageParams,
+    LinksSearchParams,
+    encode_cursor
 )
 from settings import Settings
 
+LINK_CLICKS_ROLLUPS = {
+    'hour': (LinkClickHourly, dt.timedelta(days=2)),
+    'day': (LinkClickDaily, dt.timedelta(days=30)),
+}
+LINK_FIELDS = tuple(LinkSchema.model_fields)
+get_link_fields = operator.attrgetter(*LINK_FIELDS)
+
 
 class LinksService:
     def __init__(
         self,
-        links_repo: LinksRepository,
+        links_repo: ShardedLinksRepository,
         links_cache: LinksCache,
+        clicks_buffer: LinkClicksBuffer,
+        short_codes_filter: ShortCodesFilter,
+        sweep_progress: SweepProgress,
         settings: Settings,
         request: Request | None = None
     ):
         self.links_repo = links_repo
         self.links_cache = links_cache
+        self.clicks_buffer = clicks_buffer
+        self.short_codes_filter = short_codes_filter
+        self.sweep_progress = sweep_progress
         self.settings = settings
         self._resolve_collision_attempt_limit = 5
         self.request = request
@@ -42,44 +70,105 @@ class LinksService:
         expires_at: dt.datetime | None,
         user_id: int | None
     ) -> LinkSchema:
-        def _get_short_link() -> str:
-            if not self.request:
-                raise ShortLinkGenerationException("Request is not provided")
+        link = await self._insert_link(link, expires_at, user_id)
+        await self.links_repo.commit()
+        await self.short_codes_filter.add([link.short_code])
+        await self.links_cache.invalidate_link_cache_after_create(
+            link,
+            self._redirect_cache_expire(link)
+        )
+        return LinkSchema.model_validate(link)
 
-            request_url = str(self.request.url)
-            url_parts = request_url.split('/')
-            url_parts[-1] = short_code
+    async def create_links(
+        self,
+        links: list[LinkCreateSchema],
+        expires_at: dt.datetime | None,
+        user_id: int | None
+    ) -> list[LinkBatchItemSchema]:
+        results = [LinkBatchItemSchema() for _ in links]
+        pending = list(range(len(links)))
+        created_links: list[Link] = []
 
-            return '/'.join(url_parts)
+        for _ in range(self._resolve_collision_attempt_limit):
+            candidates: dict[str, int] = {}
+            retry: list[int] = []
+            for index in pending:
+                short_code = links[index].custom_alias or self._generate_token()
+                if short_code not in candidates:
+                    candidates[short_code] = index
+                elif links[index].custom_alias:
+                    results[index].error = CustomLinkAlreadyExists.detail
+                else:
+                    retry.append(index)
 
-        short_code = await self._generate_short_code(
-            custom_token=link.custom_alias
-        )
+            batch_links = await self.links_repo.create_links(
+                links=[
+                    (
+                        links[index].original_url.unicode_string(),
+                        short_code,
+                        self._get_short_link(short_code)
+                    )
+                    for short_code, index in candidates.items()
+                ],
+                expires_at=expires_at,
+                user_id=user_id,
+                batch_size=self.settings.LINKS_BATCH_INSERT_SIZE
+            )
+            for link in batch_links:
+                results[candidates.pop(link.short_code)].link = LinkSchema.model_validate(link)
+            created_links.extend(batch_links)
 
-        link_id = await self.links_repo.create_link(
-            link=link,
-            short_code=short_code,
-            short_link=_get_short_link(),
-            expires_at=expires_at,
-            user_id=user_id
-        )
-        link = await self.links_repo.get_link_by_id(link_id)
-        await self.links_cache.invalidate_link_cache_after_create(link)
-        return LinkSchema.model_validate(link)
+            pending = retry
+            for index in candidates.values():
+                if links[index].custom_alias:
+                    results[index].error = CustomLinkAlreadyExists.detail
+                else:
+                    pending.append(index)
+            if not pending:
+                break
 
-    async def get_original_url_by_short_code(self, short_code: str) -> str:
-        link = await self.links_repo.get_link(short_code)
-        if not link:
+        for index in pending:
+            results[index].error = (
+                "Cannot generate short link after "
+                f"{self._resolve_collision_attempt_limit} attempts"
+            )
+
+        if created_links:
+            await self.links_repo.commit()
+            await self.short_codes_filter.add(link.short_code for link in created_links)
+            await self.links_cache.invalidate_link_cache_after_batch_create(created_links)
+        return results
+
+    async def get_original_url_by_short_code(
+        self,
+        short_code: str,
+        cache_checked: bool = False
+    ) -> str:
+        # cache_checked: the redirect middleware already missed the cache
+        if not cache_checked:
+            original_url = await self.links_cache.get_original_url(short_code)
+            if original_url:
+                await self.clicks_buffer.record_click(short_code, dt.datetime.now(dt.UTC))
+                return original_url
+
+        if not await self.short_codes_filter.might_exist(short_code):
             raise LinkNotFound()
 
-        await self.links_repo.update_link_stats(
-            link_id=link.id,
-            stats=LinkUpdateStatsSchema(
-                redirect_count=link.redirect_count + 1,
-                last_used_at=dt.datetime.now(dt.UTC)
+        # A miss counts the click in the database directly, not in the buffer
+        link = await self.links_repo.resolve_redirect(short_code)
+        if not link:
+            await self.short_codes_filter.mark_missing(short_code)
+            raise LinkNotFound()
+        await self.links_repo.commit()
+        await self.clicks_buffer.record_event(short_code, dt.datetime.now(dt.UTC))
+        redirect_expire = self._redirect_cache_expire(link)
+        if redirect_expire > 0:
+            await self.links_cache.set_original_url(
+                short_code,
+                link.original_url,
+                redirect_expire
             )
-        )
-
+        await self.links_cache.invalidate_links_stats_cache([short_code])
         return link.original_url
 
     async def delete_link(self, short_code: str, user_id: int | None) -> None:
@@ -88,7 +177,9 @@ class LinksService:
             user_id=user_id
         )
         await self.links_repo.delete_link(short_code=link.short_code)
-        await self.links_cache.invalidate_link_cache_after_update_delete(link)
+        await self.links_repo.commit()
+        await self.short_codes_filter.forget(link.short_code)
+        await self.links_cache.invalidate_link_cache_after_delete(link)
 
     async def update_link(
         self,
@@ -100,51 +191,232 @@ class LinksService:
             short_code=short_code,
             user_id=user_id
         )
+        # The UPDATE ... RETURNING refreshes this same identity-mapped object,
+        # the old values are needed to invalidate the pages that listed them
+        short_code, old_original_url, link_user_id = (
+            link.short_code, link.original_url, link.user_id
+        )
 
-        await self.links_repo.update_link_original_url(
+        updated_link = await self.links_repo.update_link_original_url(
+            short_code=short_code,
             link_id=link.id,
             original_url=new_original_url.unicode_string()
         )
-        updated_link = await self.links_repo.get_link_by_id(link.id)
-        await self.links_cache.invalidate_link_cache_after_update_delete(updated_link)
+        await self.links_repo.commit()
+        await self.links_cache.invalidate_link_cache_after_update(
+            short_code,
+            old_original_url,
+            link_user_id,
+            updated_link,
+            self._redirect_cache_expire(updated_link)
+        )
         return LinkSchema.model_validate(updated_link)
 
     async def get_link_stats(self, short_code: str) -> LinkStatsSchema:
-        link = await self.links_repo.get_link(short_code)
-        if not link:
+        stats = await self.links_repo.get_link_stats(short_code)
+        if not stats:
             raise LinkNotFound()
-        return LinkStatsSchema.model_validate(link)
+        return LinkStatsSchema.model_validate(stats)
+
+    async def add_pending_clicks(
+        self,
+        short_code: str,
+        stats: LinkStatsSchema | dict
+    ) -> LinkStatsSchema:
+        stats = LinkStatsSchema.model_validate(stats)
+        pending_count, pending_last_used_at = await self.clicks_buffer.get_pending(short_code)
+        if not pending_count:
+            return stats
+        return stats.model_copy(update={
+            'redirect_count': stats.redirect_count + pending_count,
+            'last_used_at': max(
+                filter(None, (stats.last_used_at, pending_last_used_at)),
+                default=None
+            ),
+        })
+
+    async def get_link_clicks(
+        self,
+        short_code: str,
+        params: LinkStatsParams
+    ) -> list[LinkClicksBucketSchema]:
+        model, default_window = LINK_CLICKS_ROLLUPS[params.granularity]
+        buckets = await self.links_repo.get_link_clicks(
+            short_code=short_code,
+            model=model,
+            since=params.since or dt.datetime.now(dt.UTC) - default_window
+        )
+        return [LinkClicksBucketSchema.model_validate(bucket) for bucket in buckets]
 
     async def search_links_by_original_url(
         self,
-        original_url: AnyHttpUrl
-    ) -> list[LinkSchema]:
-        links = await self.links_repo.get_links_by_original_url(
-            original_url=original_url.unicode_string()
+        params: LinksSearchParams
+    ) -> dict:
+        links, next_before_ids = await self.links_repo.get_links_by_original_url(
+            original_url=params.original_url.unicode_string(),
+            limit=params.limit,
+            before_ids=params.before_ids
+        )
+        return self._build_page(links, next_before_ids)
+
+    async def get_user_links(
+        self,
+        user_id: int | None,
+        params: LinksPageParams
+    ) -> dict:
+        links, next_before_ids = await self.links_repo.get_user_links(
+            user_id=user_id,
+            limit=params.limit,
+            before_ids=params.before_ids
         )
-        return [LinkSchema.model_validate(link) for link in links]
+        return self._build_page(links, next_before_ids)
 
-    async def get_user_links(self, user_id: int | None) -> list[LinkSchema]:
-        links = await self.links_repo.get_user_links(user_id)
-        return [LinkSchema.model_validate(link) for link in links]
+    async def get_expired_links(self, params: LinksPageParams) -> dict:
+        links, next_before_ids = await self.links_repo.get_expired_links(
+            limit=params.limit,
+            before_ids=params.before_ids
+        )
+        return self._build_page(links, next_before_ids)
 
-    async def get_expired_links(self) -> list[LinkSchema]:
-        links = await self.links_repo.get_expired_links()
-        return [LinkSchema.model_validate(link) for link in links]
+    async def set_expired_links(self) -> int:
+        batch_size = self.settings.EXPIRED_LINKS_BATCH_SIZE
+        expired_count = 0
+        for shard in range(self.links_repo.shard_count):
+            while True:
+                # Every batch is committed so the row locks stay short
+                expired_links = await self.links_repo.archive_expired_links(shard, batch_size)
+                await self.links_repo.commit()
+                if expired_links:
+                    await self.links_cache.invalidate_link_cache_for_bg_tasks(expired_links)
+                expired_count += len(expired_links)
+                if len(expired_links) < batch_size:
+                    break
+        return expired_count
 
-    async def set_expired_links(self):
-        expired_links = await self.links_repo.set_expired_links()
-        if expired_links:
-            await self.links_cache.invalidate_link_cache_for_bg_tasks(
-                expired_links)
+    async def cleanup_unused_links(self) -> int:
+        deleted_count = 0
+        for shard in range(self.links_repo.shard_count):
+            deleted_count += (
+                await self._cleanup_unused_links(shard, Link, 'unused_links', expired=False)
+                + await self._cleanup_unused_links(
+                    shard, LinkArchive, 'unused_archived_links', expired=True
+                )
+            )
+        return deleted_count
 
-    async def cleanup_unused_links(self):
-        deleted_links = await self.links_repo.delete_unused_links(
-            self.settings.UNUSED_LINKS_TTL_DAYS
+    async def flush_link_clicks(self) -> int:
+        clicks, events = await self.clicks_buffer.take_pending()
+        try:
+            if not clicks and not events:
+                return 0
+            await self.links_repo.apply_link_clicks(
+                clicks,
+                self.settings.CLICKS_FLUSH_BATCH_SIZE
+            )
+            await self.links_repo.apply_link_click_events(
+                events,
+                self.settings.CLICKS_FLUSH_BATCH_SIZE
+            )
+            await self.links_repo.commit()
+            await self.clicks_buffer.ack_pending()
+        finally:
+            await self.clicks_buffer.release_pending()
+        await self.links_cache.invalidate_links_stats_cache(
+            short_code for short_code, _, _ in clicks
         )
-        if deleted_links:
-            await self.links_cache.invalidate_link_cache_for_bg_tasks(
-                deleted_links)
+        # Links updated plus click events logged
+        return len(clicks) + len(events)
+
+    async def rebuild_short_codes_filter(self) -> int | None:
+        if not await self.short_codes_filter.start_rebuild():
+            return None
+        codes_count = 0
+        async for short_codes in self.links_repo.get_short_codes(
+            self.settings.SHORT_CODES_FILTER_REBUILD_BATCH_SIZE
+        ):
+            await self.short_codes_filter.add_to_rebuild(short_codes)
+            codes_count += len(short_codes)
+        if not await self.short_codes_filter.finish_rebuild():
+            return None
+        return codes_count
+
+    async def cleanup_link_clicks(self) -> int:
+        now = dt.datetime.now(dt.UTC)
+        batch_size = self.settings.LINK_CLICKS_CLEANUP_BATCH_SIZE
+        deleted_count = 0
+        for model, retention_days in (
+            (LinkClick, self.settings.LINK_CLICKS_RETENTION_DAYS),
+            (LinkClickHourly, self.settings.LINK_CLICKS_HOURLY_RETENTION_DAYS),
+            (LinkClickDaily, self.settings.LINK_CLICKS_DAILY_RETENTION_DAYS),
+        ):
+            for shard in range(self.links_repo.shard_count):
+                while True:
+                    batch_count = await self.links_repo.delete_link_clicks_before(
+                        shard=shard,
+                        model=model,
+                        cutoff=now - dt.timedelta(days=retention_days),
+                        batch_size=batch_size
+                    )
+                    await self.links_repo.commit()
+                    deleted_count += batch_count
+                    if batch_count < batch_size:
+                        break
+        return deleted_count
+
+    async def _cleanup_unused_links(
+        self,
+        shard: int,
+        model: type[Link | LinkArchive],
+        sweep: str,
+        expired: bool
+    ) -> int:
+        # An interrupted run resumes with its own cutoff after the last deleted id
+        sweep = f'{sweep}:{shard}'
+        cutoff, last_id = await self.sweep_progress.get(sweep) or (
+            dt.datetime.now(dt.UTC) - dt.timedelta(days=self.settings.UNUSED_LINKS_TTL_DAYS),
+            0
+        )
+        batch_size = self.settings.UNUSED_LINKS_CLEANUP_BATCH_SIZE
+        deleted_count = 0
+        while True:
+            deleted_links = await self.links_repo.delete_unused_links(
+                shard=shard,
+                model=model,
+                cutoff=cutoff,
+                after_id=last_id,
+                batch_size=batch_size
+            )
+            await self.links_repo.commit()
+            if not deleted_links:
+                break
+            last_id = max(link.id for link in deleted_links)
+            await self.sweep_progress.save(sweep, cutoff, last_id)
+            await self.links_cache.invalidate_link_cache_for_bg_tasks(deleted_links, expired)
+            deleted_count += len(deleted_links)
+            if len(deleted_links) < batch_size:
+                break
+            await asyncio.sleep(self.settings.UNUSED_LINKS_CLEANUP_PAUSE_SECONDS)
+        await self.sweep_progress.clear(sweep)
+        return deleted_count
+
+    @staticmethod
+    def _build_page(
+        links: Sequence[Row | Link],
+        next_before_ids: Sequence[int | None] | None
+    ) -> dict:
+        # DB rows were validated on the way in: build the page as plain
+        # dicts instead of revalidating every URL
+        return {
+            'items': [dict(zip(LINK_FIELDS, get_link_fields(link))) for link in links],
+            'next_cursor': encode_cursor(next_before_ids) if next_before_ids else None,
+        }
+
+    def _redirect_cache_expire(self, link: Link | Row) -> int:
+        expire = self.settings.REDIRECT_CACHE_TTL_SECONDS
+        if link.expires_at:
+            seconds_left = (link.expires_at - dt.datetime.now(dt.UTC)).total_seconds()
+            expire = min(expire, int(seconds_left))
+        return expire
 
     def _is_expired(self, link: Link) -> bool:
         if link.expires_at:
@@ -159,26 +431,46 @@ class LinksService:
             raise UserIsNotLinkOwner()
         return link
 
-    async def _generate_short_code(self, custom_token: str | None = None) -> str:
-        db_links = await self.links_repo.get_all_links()
-        short_codes = [link.short_code for link in db_links]
-        if custom_token:
-            if custom_token in short_codes:
-                raise CustomLinkAlreadyExists()
-            return custom_token
-
-        attempt = 0
-        while attempt < self._resolve_collision_attempt_limit:
-            token = self._generate_token()
-            if token not in short_codes:
-                return token
-            attempt += 1
+    async def _insert_link(
+        self,
+        link: LinkCreateSchema,
+        expires_at: dt.datetime | None,
+        user_id: int | None
+    ) -> Link:
+        # Uniqueness is enforced by ix_links_short_code: a taken code makes
+        # the insert a no-op, so the table is never scanned for collisions
+        for short_code in self._short_code_candidates(link.custom_alias):
+            created_link = await self.links_repo.create_link(
+                link=link,
+                short_code=short_code,
+                short_link=self._get_short_link(short_code),
+                expires_at=expires_at,
+                user_id=user_id
+            )
+            if created_link is not None:
+                return created_link
 
+        if link.custom_alias:
+            raise CustomLinkAlreadyExists()
         raise ShortLinkGenerationException(
             "Cannot generate short link after "
             f"{self._resolve_collision_attempt_limit} attempts"
         )
 
+    def _short_code_candidates(self, custom_alias: str | None) -> Iterator[str]:
+        if custom_alias:
+            yield custom_alias
+            return
+
+        for _ in range(self._resolve_collision_attempt_limit):
+            yield self._generate_token()
+
+    def _get_short_link(self, short_code: str) -> str:
+        if not self.request:
+            raise ShortLinkGenerationException("Request is not provided")
+
+        return str(self.request.url_for('redirect_to_original_url', short_code=short_code))
+
     def _generate_token(self) -> str:
         return ''.join(random.choices(
             string.ascii_letters + string.digits,
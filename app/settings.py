@@ -8,16 +8,64 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = 'links'
     POSTGRES_PASSWORD: str = 'postgres'
     POSTGRES_DRIVER: str = 'postgresql+asyncpg'
+    DB_ECHO: bool = False
+
+    # Optional read replica, same credentials as the primary
+    POSTGRES_REPLICA_HOST: str | None = None
+    POSTGRES_REPLICA_PORT: int | None = None
+    POSTGRES_REPLICA_DB: str | None = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 1.0
+
+    # Extra link shards, the primary database is always shard 0
+    LINK_SHARD_DB_URLS: list[str] = []
+    LINK_SHARD_MAP_REFRESH_SECONDS: float = 30.0
+    LINK_SHARD_MOVE_BATCH_SIZE: int = 1000
 
     JWT_SECRET_KEY: str ='very_secret_key'
     JWT_ENCODE_ALGORITHM: str = 'HS256'
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
+    # None: one thread less than the CPUs, leaving a core to the event loop
+    PASSWORD_HASHING_WORKERS: int | None = None
+    PASSWORD_HASHING_NICENESS: int = 19
+    PASSWORD_HASHING_QUEUE_WARNING_SECONDS: float = 1.0
+
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 100000
+    USER_CACHE_REDIS_ENABLED: bool = False
+
     SHORT_CODE_LENGTH: int = 8
+    LINKS_BATCH_MAX_SIZE: int = 10000
+    LINKS_BATCH_INSERT_SIZE: int = 1000
 
     REDIS_URL: str = 'redis://127.0.0.1:6379/0'
+    REDIRECT_CACHE_TTL_SECONDS: int = 3600
+    REDIRECT_NEGATIVE_CACHE_TTL_SECONDS: int = 60
+    CACHE_STALE_TTL_SECONDS: int = 60
+    CACHE_LOCK_TIMEOUT_SECONDS: int = 5
+    CACHE_LOCK_POLL_SECONDS: float = 0.05
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
+
+    SHORT_CODES_FILTER_CAPACITY: int = 1000000
+    SHORT_CODES_FILTER_ERROR_RATE: float = 0.01
+    SHORT_CODES_FILTER_REBUILD_INTERVAL_SECONDS: int = 6 * 60 * 60
+    SHORT_CODES_FILTER_REBUILD_BATCH_SIZE: int = 10000
 
     UNUSED_LINKS_TTL_DAYS: int = 30
+    UNUSED_LINKS_CLEANUP_BATCH_SIZE: int = 1000
+    UNUSED_LINKS_CLEANUP_PAUSE_SECONDS: float = 0.1
+    EXPIRED_LINKS_BATCH_SIZE: int = 1000
+
+    CELERY_METRICS_PORT: int | None = 9100
+
+    CLICKS_FLUSH_INTERVAL_SECONDS: int = 10
+    CLICKS_FLUSH_BATCH_SIZE: int = 5000
+    CLICKS_FLUSH_LOCK_TIMEOUT_SECONDS: int = 60
+    LINK_CLICKS_RETENTION_DAYS: int = 30
+    LINK_CLICKS_HOURLY_RETENTION_DAYS: int = 90
+    LINK_CLICKS_DAILY_RETENTION_DAYS: int = 730
+    LINK_CLICKS_CLEANUP_BATCH_SIZE: int = 10000
 
     @property
     def db_url(self):
@@ -27,5 +75,16 @@ class Settings(BaseSettings):
             f'{self.POSTGRES_PORT}/{self.POSTGRES_DB}'
         )
 
+    @property
+    def replica_db_url(self) -> str | None:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return (
+            f'{self.POSTGRES_DRIVER}://{self.POSTGRES_USER}:'
+            f'{self.POSTGRES_PASSWORD}@{self.POSTGRES_REPLICA_HOST}:'
+            f'{self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT}/'
+            f'{self.POSTGRES_REPLICA_DB or self.POSTGRES_DB}'
+        )
+
 
 settings = Settings()
@@ -0,0 +1,37 @@
+"""Tests run against the database from settings, Redis is replaced by fakeredis.
+
+Run from app/ after `alembic upgrade head`: python -m pytest tests
+"""
+import httpx
+import pytest
+
+from benchmarks.common import init_fake_cache
+from database.database import engine
+from main import app
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+async def client():
+    init_fake_cache()
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url='http://test'
+    ) as client:
+        yield client
+    # Connections are bound to the event loop of the test
+    await engine.dispose()
+
+
+@pytest.fixture
+async def auth_headers(client):
+    response = await client.post(
+        '/users',
+        json={'username': f'test-{id(client)}', 'password': 'password'}
+    )
+    assert response.status_code == 201, response.text
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
@@ -0,0 +1,38 @@
+from uuid import uuid4
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_invalidates_search_by_old_url(client, auth_headers):
+    old_url = f'https://example.com/{uuid4().hex}/old'
+    new_url = f'https://example.com/{uuid4().hex}/new'
+    response = await client.post(
+        '/links/shorten',
+        json={'original_url': old_url},
+        headers=auth_headers
+    )
+    assert response.status_code == 201, response.text
+    short_code = response.json()['short_code']
+
+    # Caches the page of the old URL
+    response = await client.get('/links/search', params={'original_url': old_url})
+    assert [link['short_code'] for link in response.json()['items']] == [short_code]
+
+    response = await client.put(
+        f'/links/{short_code}',
+        json={'original_url': new_url},
+        headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+
+    response = await client.get('/links/search', params={'original_url': old_url})
+    assert response.json()['items'] == []
+    response = await client.get('/links/search', params={'original_url': new_url})
+    assert [link['short_code'] for link in response.json()['items']] == [short_code]
+
+
+async def test_malformed_cursor_returns_422(client):
+    response = await client.get('/links/expired', params={'cursor': '!!!'})
+    assert response.status_code == 422
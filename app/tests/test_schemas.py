@@ -0,0 +1,17 @@
+import pytest
+from pydantic import ValidationError
+
+from schemas import LinksPageParams
+from schemas.links import encode_cursor
+
+
+@pytest.mark.parametrize('before_ids', [[123], [5, None, 0], [0, 7]])
+def test_cursor_round_trip(before_ids):
+    cursor = encode_cursor(before_ids)
+    assert LinksPageParams(cursor=cursor).before_ids == before_ids
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'MTIz!', '', 'LA', 'MSAy', '_w', 'MTIz/', 'MDE'])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValidationError):
+        LinksPageParams(cursor=cursor)